@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 
 # 将 src 目录添加到 Python 路径，以便导入模块
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
@@ -8,6 +9,8 @@ from PyQt5.QtWidgets import QApplication
 from src.gui.main_window import EveSearchApp
 
 if __name__ == "__main__":
+    # 打包为 exe 后，索引构建/更新使用的子进程需要由此进入而不是再启动一个界面
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     window = EveSearchApp()
@@ -9,75 +9,474 @@ Created: 2026
 """
 
 import requests
-import os
-import zipfile
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
 import os
 import shutil
+import tempfile
+import zipfile
 import json
+import copy
+import pickle
+import mmap
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# 优先使用 orjson (C 实现，直接处理 bytes)，未安装时回退到标准库 json
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+# 可选依赖：安装 stream-unzip 后下载与解压流水线并行
+try:
+    from stream_unzip import stream_unzip
+except ImportError:
+    stream_unzip = None
+
+# 可选依赖：python-isal 的 isal_zlib 与 zlib 接口兼容，Deflate 解压速度约为 zlib 的数倍
+# 只在 _extract_member 中创建解压器使用，不替换 zipfile 模块的 zlib，进程内其他 ZIP 读写不受影响
+try:
+    from isal import isal_zlib
+except ImportError:
+    isal_zlib = None
+
+# 下载时每次写入的块大小 (1 MiB)，过小的块会显著拖慢大文件下载
+HTTP_CHUNK = 1 << 20
+HTTP_TIMEOUT = 30
+# 下载压缩包时的内存缓冲上限 (64 MiB)，超过后自动转存到临时文件
+DOWNLOAD_SPOOL_SIZE = 64 << 20
+# 变更文件的写缓冲大小
+WRITE_BUFFER = 1 << 20
+# 压缩包条目少于该数量时直接单线程解压
+PARALLEL_EXTRACT_MIN = 8
+# 用 ISA-L 解压时每次读取的压缩数据大小
+INFLATE_CHUNK = 256 << 10
+# latest.jsonl 的 ETag 缓存，用于条件请求
+LATEST_ETAG_FILE = "latest.etag"
+# 每个 SDE jsonl 文件旁的 _key -> (偏移, 长度) 索引文件后缀
+KEY_INDEX_SUFFIX = ".idx"
+# 索引文件格式版本与 pickle 协议：协议固定，不随解释器升级变化；格式变化时提升版本号，旧文件自动视为失效
+KEY_INDEX_VERSION = 1
+KEY_INDEX_PROTOCOL = 4
+# 解压后写入的本地版本号文件
+BUILD_NUMBER_FILE = ".buildnumber"
+
+# 所有请求都发往同一主机，共享一个 Session 以复用 TCP/TLS 连接
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+# ACCEPT_ENCODING 只包含 urllib3 能解码的格式 (安装 zstandard / brotli 后会自动带上 zstd / br)
+SESSION.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+def _load_latest_cache():
+    """ 读取上次 latest.jsonl 的 ETag 及版本信息，不存在或损坏时返回 None """
+    try:
+        with open(LATEST_ETAG_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("etag") and "buildNumber" in cache:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return None
 
 def read_SDE_latest_info():
     url = "https://developers.eveonline.com/static-data/tranquility/latest.jsonl"
-    filename = "latest.jsonl"
-    response = requests.get(url, stream=True).json()
-    return response['_key'], response['buildNumber'], response['releaseDate']
+    # 带上 If-None-Match，版本未变化时服务器返回 304，无需传输正文
+    cache = _load_latest_cache()
+    headers = {"If-None-Match": cache["etag"]} if cache else {}
+    # 版本信息在 jsonl 的第一行，流式读取到第一行就关闭连接，不必下载并解析整个响应体
+    with SESSION.get(url, headers=headers, stream=True, timeout=HTTP_TIMEOUT) as response:
+        if response.status_code == 304 and cache:
+            return cache['_key'], cache['buildNumber'], cache['releaseDate']
+        response.raise_for_status()
+        data = _loads(next(response.iter_lines(chunk_size=4096)))
+        etag = response.headers.get("ETag")
+    if etag:
+        with open(LATEST_ETAG_FILE, "w", encoding="utf-8") as f:
+            json.dump({
+                "etag": etag,
+                "_key": data['_key'],
+                "buildNumber": data['buildNumber'],
+                "releaseDate": data['releaseDate'],
+            }, f)
+    return data['_key'], data['buildNumber'], data['releaseDate']
+
+def _extract_member(zf, info, extract_dir):
+    """
+    解压单个条目；安装了 python-isal 时 Deflate 条目用 ISA-L 解压
+    做法是把条目当作 STORED 打开读出原始 Deflate 数据，解压后自行校验 CRC，
+    路径不在 extract_dir 内的条目和目录仍交给 zf.extract 处理 (由它做路径清理)
+    """
+    if isal_zlib is None or info.compress_type != zipfile.ZIP_DEFLATED or info.is_dir():
+        zf.extract(info, extract_dir)
+        return
+    root = os.path.abspath(extract_dir)
+    target = os.path.abspath(os.path.join(root, info.filename))
+    if not target.startswith(root + os.sep):
+        zf.extract(info, extract_dir)
+        return
+
+    raw = copy.copy(info)
+    raw.compress_type = zipfile.ZIP_STORED
+    raw.file_size = info.compress_size
+    del raw.CRC  # 原始数据没有对应的 CRC，解压后按原条目的 CRC 校验
+    inflater = isal_zlib.decompressobj(-15)
+    crc = 0
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with zf.open(raw) as src, open(target, "wb") as dst:
+        while True:
+            chunk = src.read(INFLATE_CHUNK)
+            if not chunk:
+                break
+            data = inflater.decompress(chunk)
+            crc = isal_zlib.crc32(data, crc)
+            dst.write(data)
+        data = inflater.flush()
+        crc = isal_zlib.crc32(data, crc)
+        dst.write(data)
+    if crc != info.CRC:
+        raise zipfile.BadZipFile(f"Bad CRC-32 for file {info.filename!r}")
+
+def extract_zip(source, extract_dir, progress_callback=None):
+    """
+    多线程解压压缩包，source 可以是文件路径或已打开的文件对象
+    progress_callback(已完成条目数, 条目总数) 可选，每解压完一个条目调用一次
+    zlib 解压时会释放 GIL，因此线程可以并行；ZipFile 不是线程安全的，每个线程单独打开一个只读句柄
+    文件对象无法重复打开，此时共用一个 ZipFile：读取压缩数据时内部加锁并各自记录偏移，解压在锁外并行
+    """
+    with zipfile.ZipFile(source, 'r') as shared:
+        members = shared.infolist()
+        total = len(members)
+        if total < PARALLEL_EXTRACT_MIN:
+            for done, info in enumerate(members, 1):
+                _extract_member(shared, info, extract_dir)
+                if progress_callback:
+                    progress_callback(done, total)
+            return
+
+        # 预先创建目录，避免多个线程在 zf.extract 中同时 makedirs 产生竞争
+        # 路径在 extract_dir 之外的条目 (../ 或绝对路径) 跳过，由 zf.extract 清理路径后再创建
+        root = os.path.abspath(extract_dir)
+        for info in members:
+            target = os.path.abspath(os.path.join(root, info.filename))
+            if not target.startswith(root + os.sep):
+                continue
+            os.makedirs(target if info.is_dir() else os.path.dirname(target), exist_ok=True)
+
+        local = threading.local()
+        handles = []
+
+        def extract_one(info):
+            zf = getattr(local, "zf", None)
+            if zf is None:
+                if isinstance(source, str):
+                    zf = zipfile.ZipFile(source, 'r')
+                    handles.append(zf)
+                else:
+                    zf = shared
+                local.zf = zf
+            _extract_member(zf, info, extract_dir)
+
+        try:
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                for done, _ in enumerate(executor.map(extract_one, members), 1):
+                    if progress_callback:
+                        progress_callback(done, total)
+        finally:
+            for zf in handles:
+                zf.close()
+
+def stream_extract(data_chunks, extract_dir):
+    """
+    边下载边解压，网络传输与 Deflate 解压重叠进行，不在磁盘上落地压缩包
+    data_chunks 为压缩包内容的字节块迭代器 (如 response.iter_content)，需要已安装 stream_unzip
+    """
+    root = os.path.abspath(extract_dir)
+    for file_name, file_size, chunks in stream_unzip(data_chunks):
+        name = file_name.decode("utf-8")
+        target = os.path.abspath(os.path.join(root, name))
+        # 每个条目的 chunks 必须读完才能继续下一个条目
+        if not target.startswith(root + os.sep) or name.endswith("/"):
+            if name.endswith("/") and target.startswith(root + os.sep):
+                os.makedirs(target, exist_ok=True)
+            for _ in chunks:
+                pass
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+def spooled_buffer(max_size):
+    """
+    压缩包下载缓冲区：max_size 以内放在内存中，超过后自动转存到匿名临时文件
+    Python 3.11 之前的 SpooledTemporaryFile 没有 seekable()，zipfile 读取时会报 AttributeError，这里补上
+    """
+    buf = tempfile.SpooledTemporaryFile(max_size=max_size)
+    if not hasattr(buf, "seekable"):
+        buf.seekable = lambda: True
+    return buf
+
+def _download_zip(url, extract_dir):
+    """ 下载压缩包并解压到 extract_dir，压缩包只在内存中缓冲 (过大时才溢出到临时文件) """
+    with SESSION.get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+        response.raise_for_status()
+        if stream_unzip is not None:
+            print("正在边下载边解压...")
+            stream_extract(response.iter_content(chunk_size=HTTP_CHUNK), extract_dir)
+            print(f"解压完成，文件保存在目录: {extract_dir}")
+            return
+        with spooled_buffer(DOWNLOAD_SPOOL_SIZE) as buf:
+            # decode_content=True 让 urllib3 按 Content-Encoding 解码传输压缩
+            response.raw.decode_content = True
+            shutil.copyfileobj(response.raw, buf, HTTP_CHUNK)
+            print("下载完成")
+            buf.seek(0)
+            print("正在解压...")
+            extract_zip(buf, extract_dir)
+    print(f"解压完成，文件保存在目录: {extract_dir}")
 
 def download_latest_eve_SDE_json():
     url = "https://developers.eveonline.com/static-data/eve-online-static-data-latest-jsonl.zip"
-    filename = "eve_SDE_jsonl.zip"
-    response = requests.get(url, stream=True)
-    with open(filename, "wb") as f:
-        shutil.copyfileobj(response.raw, f)
-    print(f"下载完成，文件保存在: {filename}")
-    # 解压
-    print("正在解压...")
-    with zipfile.ZipFile(filename, 'r') as zf:
-        zf.extractall("eve_sde_jsonl")
-    # 清理压缩包
-    os.remove(filename)
-    print(f"解压完成，文件保存在目录: eve_sde_jsonl")
+    _download_zip(url, "eve_sde_jsonl")
+    build_key_index("eve_sde_jsonl")
+    write_build_number("eve_sde_jsonl")
+
+def write_build_number(sde_dir):
+    """ 解压后记录当前版本号 (.buildnumber)，之后检查更新时无需再解析 _sde.jsonl；CLI 与 GUI 的下载都调用 """
+    build_number = _read_sde_meta_build_number(sde_dir)
+    if build_number is not None:
+        with open(os.path.join(sde_dir, BUILD_NUMBER_FILE), "w", encoding="utf-8") as f:
+            f.write(str(build_number))
+
+def _read_sde_meta_build_number(sde_dir):
+    """ 从 _sde.jsonl 第一行读取 buildNumber，文件不存在时返回 None """
+    try:
+        with open(os.path.join(sde_dir, "_sde.jsonl"), "rb") as f:
+            line = f.readline()  # 只读取第一行
+    except OSError:
+        return None
+    return _loads(line).get("buildNumber")
+
+def read_local_build_number(sde_dir="eve_sde_jsonl"):
+    """
+    读取本地 SDE 版本号，优先使用 .buildnumber 文件
+    文件缺失、损坏或比 _sde.jsonl 旧 (数据包被其他途径重新解压过) 时回退到 _sde.jsonl
+    """
+    sidecar = os.path.join(sde_dir, BUILD_NUMBER_FILE)
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(os.path.join(sde_dir, "_sde.jsonl")):
+            with open(sidecar, "r", encoding="utf-8") as f:
+                return int(f.read().strip())
+    except (OSError, ValueError):
+        pass
+    return _read_sde_meta_build_number(sde_dir)
+
+# SDE 每行几乎都以 _key 开头：用正则直接从行首取出 _key，不必解析整行 JSON
+# 字符串键含转义或 _key 不在行首时匹配失败，再退回完整解析
+_LEADING_KEY_RE = re.compile(rb'\{\s*"_key"\s*:\s*(?:"([^"\\]*)"|(-?\d+)(?=\s*[,}]))')
+
+def _sniff_key(line):
+    m = _LEADING_KEY_RE.match(line)
+    if m is not None:
+        return m.group(1).decode("utf-8") if m.group(1) is not None else int(m.group(2))
+    try:
+        return _loads(line).get("_key")
+    except (ValueError, AttributeError):
+        return None
+
+def _build_key_index_for_file(path):
+    offsets = {}
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            key = _sniff_key(line)
+            if key is not None:
+                offsets[key] = (offset, len(line))
+            offset += len(line)
+    st = os.stat(path)
+    with open(path + KEY_INDEX_SUFFIX, "wb") as f:
+        pickle.dump({
+            "version": KEY_INDEX_VERSION,
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "offsets": offsets,
+        }, f, protocol=KEY_INDEX_PROTOCOL)
+
+def build_key_index(sde_dir):
+    """
+    为目录下每个 jsonl 文件生成 _key -> (偏移, 长度) 索引
+    生成变更日志时可直接按偏移读取条目，无需逐行扫描整个文件
+    """
+    with os.scandir(sde_dir) as it:
+        paths = [e.path for e in it if e.name.endswith(".jsonl") and e.is_file()]
+    for path in paths:
+        _build_key_index_for_file(path)
+
+def _load_key_index(path):
+    """ 读取 path 对应的索引，不存在、格式版本不符 (含旧版 marshal 文件) 或与源文件不一致时返回 None """
+    try:
+        with open(path + KEY_INDEX_SUFFIX, "rb") as f:
+            index = pickle.load(f)
+        st = os.stat(path)
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != KEY_INDEX_VERSION:
+        return None
+    if index.get("size") != st.st_size or index.get("mtime") != st.st_mtime_ns:
+        return None
+    return index["offsets"]
+
+def iter_wanted_records(source_path, status_map):
+    """ 从源文件中取出 status_map 指定的条目，返回 (原始行 bytes, status) """
+    offsets = _load_key_index(source_path)
+    if offsets is not None:
+        if not offsets:
+            return
+        # 每个条目只查一次索引，再按偏移排序，读取 mmap 时只向前推进，可以利用系统预读
+        hits = []
+        for item_id, status in status_map.items():
+            loc = offsets.get(item_id)
+            if loc is not None:
+                hits.append((loc, status))
+        if not hits:
+            return
+        hits.sort()
+        with open(source_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for (start, length), status in hits:
+                yield mm[start:start + length], status
+        return
+
+    # 没有可用索引时退回扫描：用只匹配目标 _key 的正则在整个 mmap 上 finditer，
+    # 逐字节的查找全部在 re 的 C 实现中完成，Python 层只处理命中的行
+    pending = dict(status_map)
+    if not os.path.getsize(source_path):
+        return
+    pattern = _compile_wanted_key_re(pending)
+    last_line_start = -1
+    with open(source_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for m in pattern.finditer(mm):
+            line_start = mm.rfind(b"\n", 0, m.start()) + 1
+            if line_start == last_line_start:
+                continue  # 同一行的其他命中，该行已处理过
+            last_line_start = line_start
+            line_end = mm.find(b"\n", m.end())
+            line = mm[line_start:line_end if line_end >= 0 else mm.size()]
+            # 命中的可能是嵌套对象里的 _key，与索引路径一样用 _sniff_key 取顶层 _key
+            status = pending.pop(_sniff_key(line), None)
+            if status:
+                yield line, status
+                if not pending:
+                    break  # 需要的条目已全部找到
+
+def _compile_wanted_key_re(keys):
+    """ 生成只匹配指定 _key 的正则：字符串键带引号，整数键不带 """
+    str_keys = [re.escape(k.encode("utf-8")) for k in keys if isinstance(k, str)]
+    int_keys = [str(k).encode("ascii") for k in keys if isinstance(k, int)]
+    str_alt = b"|".join(str_keys) or rb"(?!)"
+    int_alt = b"|".join(int_keys) or rb"(?!)"
+    return re.compile(rb'"_key"\s*:\s*(?:"(' + str_alt + rb')"|(' + int_alt + rb')(?![\w.]))')
 
 def download_latest_eve_SDE_yaml():
     url = "https://developers.eveonline.com/static-data/eve-online-static-data-latest-yaml.zip"
-    filename = "eve_SDE_yaml.zip"
-    response = requests.get(url, stream=True)
-    with open(filename, "wb") as f:
-        shutil.copyfileobj(response.raw, f)
-    print(f"下载完成，文件保存在: {filename}")
-    # 解压
-    print("正在解压...")
-    with zipfile.ZipFile(filename, 'r') as zf:
-        zf.extractall("eve_sde_yaml")
-    # 清理压缩包
-    os.remove(filename)
-    print(f"解压完成，文件保存在目录: eve_sde_yaml")
-
-def update_SDE():
+    _download_zip(url, "eve_sde_yaml")
+
+def download_latest_eve_SDE(include_yaml=False):
+    """
+    下载最新的 SDE 数据包
+    两个压缩包互不依赖且都受网络限制，include_yaml 时用线程并发下载
+    """
+    if not include_yaml:
+        download_latest_eve_SDE_json()
+        return
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(download_latest_eve_SDE_json),
+            executor.submit(download_latest_eve_SDE_yaml),
+        ]
+        for future in futures:
+            future.result()  # 传播下载异常
+
+def _collect_table_changes(item):
+    """ 进程池任务：返回单个源表中新增/修改条目序列化后的行 """
+    key, status_map = item
+    source_path = f"eve_sde_jsonl/{key}.jsonl"
+    if not os.path.exists(source_path):
+        return []
+    records = []
+    for line, status in iter_wanted_records(source_path, status_map):
+        records.append(_append_fields(line, {"_source_table": key, "_status": status}))
+    return records
+
+def _append_fields(line, fields):
+    """
+    在原始 JSON 行末尾追加字段，不必把整条记录解析后再序列化一遍
+    行不是以 } 结尾的对象时退回解析 + 序列化
+    """
+    line = line.rstrip(b" \t\r\n")
+    if line.endswith(b"}"):
+        body = line[:-1].rstrip()
+        extra = b",".join(_dumps(k) + b":" + _dumps(v) for k, v in fields.items())
+        sep = b"" if body.endswith(b"{") else b","
+        return body + sep + extra + b"}\n"
+    data = _loads(line)
+    data.update(fields)
+    return _dumps(data) + b"\n"
+
+def update_SDE(include_yaml=False, latest_info=None):
     # 在文件夹_sde_jsonl和_sde_yaml和read_SDE_latest_info返回的buildNumber进行对比，不一致则更新
-    latest_key, latest_buildNumber, latest_releaseDate = read_SDE_latest_info()
-    if not os.path.exists("eve_sde_jsonl"): # or not os.path.exists("eve_sde_yaml"):
+    # latest_info 可由调用方传入，避免重复请求 latest.jsonl
+    if latest_info is None:
+        latest_info = read_SDE_latest_info()
+    latest_key, latest_buildNumber, latest_releaseDate = latest_info
+    jsonl_ok = os.path.isdir("eve_sde_jsonl")
+    yaml_ok = not include_yaml or os.path.isdir("eve_sde_yaml")
+    if not (jsonl_ok and yaml_ok):
         print("SDE 文件夹不存在，正在下载最新版本...")
-        download_latest_eve_SDE_json()
-        # download_latest_eve_SDE_yaml()
+        download_latest_eve_SDE(include_yaml)
     else:
         print("SDE 文件夹已存在，正在对比版本...")
-        with open("eve_sde_jsonl/_sde.jsonl", "r", encoding="utf-8") as f:
-            line = f.readline()  # 读取第一行
-            data = json.loads(line)  # 解析 JSON 数据
-            current_buildNumber = data["buildNumber"]
+        current_buildNumber = read_local_build_number("eve_sde_jsonl")
         if current_buildNumber != latest_buildNumber:
             print(f"目前版本{current_buildNumber}发现新的版本: {latest_buildNumber}，正在下载...")
-            download_latest_eve_SDE_json()
-            # download_latest_eve_SDE_yaml()
+            download_latest_eve_SDE(include_yaml)
             print(f"更新完成，版本号: {latest_buildNumber}")
         else:
             print("目前版本已是最新版本，无需更新")
     print("SDE 更新完成")
 
+def _fetch_changes(build_number):
+    """
+    下载并解析指定版本的变更清单 (体积很小，直接读入内存)，返回每行解析后的 dict 列表
+    在后台线程中执行时，下载和解析都与数据包更新重叠进行
+    """
+    url = f"https://developers.eveonline.com/static-data/tranquility/changes/{build_number}.jsonl"
+    response = SESSION.get(url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    entries = []
+    for line in response.content.split(b"\n"):
+        if not line.strip(): continue
+        try:
+            entries.append(_loads(line))
+        except ValueError as e:
+            print(f"Error processing line: {e}")
+    return entries
+
 def get_SDE_update():
-    latest_key, latest_buildNumber, latest_releaseDate = read_SDE_latest_info()
-    update_SDE()
-    url = f"https://developers.eveonline.com/static-data/tranquility/changes/{latest_buildNumber}.jsonl"
-    response = requests.get(url, stream=True).iter_lines()
+    latest_info = read_SDE_latest_info()
+    latest_key, latest_buildNumber, latest_releaseDate = latest_info
+    # 变更清单与数据包下载互不依赖：后台线程获取变更清单，同时检查/更新数据包
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        changes_future = executor.submit(_fetch_changes, latest_buildNumber)
+        update_SDE(latest_info=latest_info)
+        entries = changes_future.result()
     # 替换非法字符
     safe_release_date = latest_releaseDate.replace(":", "-")
     # 检查并创建目录
@@ -85,63 +484,64 @@ def get_SDE_update():
     os.makedirs(output_dir, exist_ok=True)  # 如果目录不存在，则创建
     changes_file = f"eve_sde_update/eve_sde_changes_{safe_release_date}.jsonl"
     
-    # 清空或创建变更文件
-    with open(changes_file, "w", encoding="utf-8") as cf:
-        pass
-        
-    for line in response:
-        if not line: continue
-        try:
-            line_data = json.loads(line)
-            key = line_data.get("_key")
+    # 变更文件只打开一次 (覆盖写入)，所有记录都写入同一个缓冲句柄
+    # 记录先累积到 bytearray，满 WRITE_BUFFER 才写入一次
+    # (超过缓冲区大小的写入会被 BufferedWriter 直接交给底层文件，不会再复制一遍)
+    with open(changes_file, "wb") as cf:
+        buf = bytearray()
+
+        def emit(records):
+            for record in records:
+                buf.extend(record)
+            if len(buf) >= WRITE_BUFFER:
+                cf.write(buf)
+                buf.clear()
+
+        wanted = {}  # 源表 -> {条目ID: 状态}
+        for line_data in entries:
+            try:
+                key = line_data.get("_key")
             
-            if key == '_meta':
-                print(f"更新版本号：{line_data['buildNumber']} 发布日期：{line_data['releaseDate']}")
-                continue
+                if key == '_meta':
+                    print(f"更新版本号：{line_data['buildNumber']} 发布日期：{line_data['releaseDate']}")
+                    continue
                 
-            added_ids = set(line_data.get("added", []))
-            changed_ids = set(line_data.get("changed", []))
-            removed_ids = set(line_data.get("removed", []))
+                added_ids = set(line_data.get("added", []))
+                changed_ids = set(line_data.get("changed", []))
+                removed_ids = set(line_data.get("removed", []))
             
-            if not (added_ids or changed_ids or removed_ids): continue
+                if not (added_ids or changed_ids or removed_ids): continue
             
-            print(f"处理变更: {key} (新增:{len(added_ids)} 修改:{len(changed_ids)} 删除:{len(removed_ids)})")
+                print(f"处理变更: {key} (新增:{len(added_ids)} 修改:{len(changed_ids)} 删除:{len(removed_ids)})")
             
-            # 1. Removed
-            if removed_ids:
-                with open(changes_file, "a", encoding="utf-8") as cf:
-                    for rid in removed_ids:
-                        record = {
-                            "_key": rid,
-                            "_source_table": key,
-                            "_status": "removed",
-                            "name": {"en": "(Item Removed)", "zh": "(条目已删除)"}
-                        }
-                        cf.write(json.dumps(record, ensure_ascii=False) + "\n")
+                # 1. Removed
+                if removed_ids:
+                    emit(_dumps({
+                        "_key": rid,
+                        "_source_table": key,
+                        "_status": "removed",
+                        "name": {"en": "(Item Removed)", "zh": "(条目已删除)"}
+                    }) + b"\n" for rid in removed_ids)
             
-            # 2. Added/Changed
-            if added_ids or changed_ids:
-                source_path = f"eve_sde_jsonl/{key}.jsonl"
-                if os.path.exists(source_path):
-                    with open(source_path, "r", encoding="utf-8") as f:
-                        for f_line in f:
-                            try:
-                                data = json.loads(f_line)
-                                item_id = data.get("_key")
-                                status = None
-                                if item_id in added_ids:
-                                    status = "added"
-                                elif item_id in changed_ids:
-                                    status = "changed"
-                                
-                                if status:
-                                    data["_source_table"] = key
-                                    data["_status"] = status
-                                    with open(changes_file, "a", encoding="utf-8") as cf:
-                                        cf.write(json.dumps(data, ensure_ascii=False) + "\n")
-                            except: pass
-        except Exception as e:
-            print(f"Error processing line: {e}")
+                # 2. Added/Changed: 先汇总，稍后每个源文件只扫描一次
+                if added_ids or changed_ids:
+                    status_map = wanted.setdefault(key, {})
+                    status_map.update(dict.fromkeys(changed_ids, "changed"))
+                    status_map.update(dict.fromkeys(added_ids, "added"))  # 同时出现时以新增为准
+            except Exception as e:
+                print(f"Error processing line: {e}")
+            
+        # 各源文件互不相关，用多进程并行扫描；map 保持顺序，写入仍在主进程完成
+        if len(wanted) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(wanted), os.cpu_count() or 1)) as executor:
+                results = executor.map(_collect_table_changes, wanted.items())
+                for records in results:
+                    emit(records)
+        else:
+            for item in wanted.items():
+                emit(_collect_table_changes(item))
+        if buf:
+            cf.write(buf)
             
     print(f"更新完成，变更文件保存在: {changes_file}")
     
@@ -1,41 +1,371 @@
 import sqlite3
 import os
 import json
+import heapq
+import mmap
+import multiprocessing
+import re
+import threading
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
+
+# 优先使用 orjson (C 实现，直接解析 bytes)，未安装时回退到标准库 json
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+# 可选依赖：zstandard，安装后 json_data 以字典压缩的 BLOB 存储，数据库体积约为原来的 1/4 ~ 1/8
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# FZF 风格评分参数：每个命中字符得分，词首/连续命中奖励，间隔惩罚
+SCORE_MATCH = 16
+SCORE_BOUNDARY = 15
+SCORE_CONSECUTIVE = 15
+SCORE_GAP = -3
+SCORE_EXACT = 1000
+BOUNDARY_CHARS = " /._-()'"
+
+# 数据库结构版本 (PRAGMA user_version)，低于该版本的旧库需要重建索引
+# 2: items.source_file (文件名) 改为 source_file_id，文件名保存在 source_files 表
+# 4: search_text 在建库时写入，与查询关键词使用同一个 normalize_text 规范化
+SCHEMA_VERSION = 4
+
+# 普通 B-tree 索引 (名称, 建表语句)；重建数据时先删除，写入完成后再统一创建
+INDEXES = (
+    # Index for faster lookup by ID
+    ("idx_id", "CREATE INDEX IF NOT EXISTS idx_id ON items(id)"),
+    # Index for exact name match (optional)
+    ("idx_name_zh", "CREATE INDEX IF NOT EXISTS idx_name_zh ON items(name_zh)"),
+    ("idx_name_en", "CREATE INDEX IF NOT EXISTS idx_name_en ON items(name_en)"),
+)
+
+# 每个连接打开时设置的参数：WAL 让搜索与重建/名称查询互不阻塞，
+# 临时表和临时索引放在内存中，读取走 mmap，页缓存 64 MiB
+CONNECT_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+# 重建索引时使用的写入优化参数：WAL + NORMAL 同步减少 fsync，大缓存和 mmap 减少页换入换出
+# 不使用 locking_mode=EXCLUSIVE：WAL 下独占锁会让重建期间的搜索连接一直等到超时
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",
+    "PRAGMA mmap_size=268435456",
+)
+
+# json_data 压缩参数：压缩级别、字典大小、每个文件抽取多少行训练字典
+ZSTD_LEVEL = 3
+ZSTD_DICT_SIZE = 112 << 10
+ZSTD_SAMPLE_LINES = 200
+
+# 建库时每个子进程任务解析的原始数据量 (按行边界切分)，以及每个工作进程最多排队的任务数：
+# 结果经进程管道传回主进程，限制任务大小和在途任务数，峰值内存不随最大的表增长
+PARSE_CHUNK_BYTES = 8 << 20
+PARSE_TASKS_PER_WORKER = 2
+
+# 排序候选池为返回数量的倍数，避免单字符等宽泛查询把全库结果拉进 Python 评分
+RANK_POOL_FACTOR = 10
+
+@lru_cache(maxsize=64)
+def _subsequence_re(keyword):
+    """ 子序列匹配的正则 "abc" -> (a).*?(b).*?(c)：一次 C 层扫描得到每个字符最靠左的命中位置 """
+    return re.compile(".*?".join("(" + re.escape(c) + ")" for c in keyword), re.DOTALL)
+
+def fuzzy_score(text, keyword):
+    """
+    计算关键词在文本中的匹配得分 (均为小写)，不匹配返回 None
+    连续子串直接按连续命中计分，否则按子序列逐字计分；命中越靠近词首、间隔越小得分越高
+    """
+    if text == keyword:
+        return SCORE_EXACT
+    pos = text.find(keyword)
+    if pos >= 0:
+        score = SCORE_MATCH * len(keyword) + SCORE_CONSECUTIVE * (len(keyword) - 1)
+        if pos == 0 or text[pos - 1] in BOUNDARY_CHARS:
+            score += SCORE_BOUNDARY
+        return score - pos
+
+    m = _subsequence_re(keyword).search(text)
+    if m is None:
+        return None
+    score = 0
+    prev = -1
+    for i in range(1, len(keyword) + 1):
+        idx = m.start(i)
+        score += SCORE_MATCH
+        if idx == 0 or text[idx - 1] in BOUNDARY_CHARS:
+            score += SCORE_BOUNDARY
+        if prev >= 0:
+            if idx == prev + 1:
+                score += SCORE_CONSECUTIVE
+            else:
+                score += SCORE_GAP * (idx - prev - 1)
+        prev = idx
+    return score
+
+def score_row(row, keywords):
+    """ 一行结果的总得分：每个关键词取 ID/中文名/英文名 中的最高分 """
+    fields = (row["id"], normalize_text(row["name_zh"] or ""), normalize_text(row["name_en"] or ""))
+    total = 0
+    for kw in keywords:
+        best = None
+        for text in fields:
+            score = fuzzy_score(text, kw)
+            if score is not None and (best is None or score > best):
+                best = score
+        if best is None:
+            # 子序列跨字段匹配时退回整体文本评分
+            best = fuzzy_score(row["search_text"], kw) or 0
+        total += best
+    return total
+
+def normalize_text(text):
+    """
+    搜索文本的统一规范化：NFKC (全角字母数字等兼容字符转为半角) + 小写
+    建库 (search_text) 与查询关键词使用同一函数，两边即可按字节比较，无需再做大小写折叠
+    纯 ASCII 文本在 NFKC 下不变，跳过 normalize 直接走 str.lower 的 ASCII 快速路径
+    """
+    if text.isascii():
+        return text.lower()
+    return unicodedata.normalize("NFKC", text).lower()
+
+# 搜索只需预计算的名称列，不取 json_data：完整 JSON 在打开详情时再按 rowid 读取
+SEARCH_COLUMNS = "SELECT rowid, id, source_file_id, name_zh, name_en, search_text FROM items WHERE "
+# 不加 ORDER BY：排序会让 SQLite 先求出全部命中行再放进临时 B 树，宽泛的短关键词要扫完整张表；
+# 只取前 LIMIT 个命中，找够即停止，候选池的排序在 Python 中完成
+SEARCH_LIMIT = " LIMIT ?"
+# 按 ID 精确查找 (走 idx_id 索引)
+SEARCH_BY_ID_SQL = SEARCH_COLUMNS + "id = ?"
+
+# 按 rowid 读取完整 JSON，同时校验 id 和来源文件
+GET_JSON_SQL = (
+    "SELECT json_data FROM items WHERE rowid = ? AND id = ? "
+    "AND source_file_id = (SELECT id FROM source_files WHERE name = ?)"
+)
+
+# search_text 与关键词都已规范化为小写，用区分大小写的 GLOB 按字符比较，不必像 LIKE 那样逐字符做大小写折叠
+# GLOB 的通配符 * ? [ 放进方括号即按字面匹配
+_GLOB_ESCAPE = str.maketrans({"*": "[*]", "?": "[?]", "[": "[[]"})
+
+def glob_escape(text):
+    return text.translate(_GLOB_ESCAPE)
+
+@lru_cache(maxsize=32)
+def _search_sql(use_fts, glob_count, with_candidates):
+    """ 子串搜索的 SQL：FTS 条件 (可选) + glob_count 个 GLOB + rowid 候选集 (可选)，LIMIT 作为参数传入 """
+    conditions = []
+    if use_fts:
+        conditions.append("rowid IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)")
+    conditions.extend(["search_text GLOB ?"] * glob_count)
+    if with_candidates:
+        conditions.append("rowid IN (SELECT value FROM json_each(?))")
+    return SEARCH_COLUMNS + " AND ".join(conditions) + SEARCH_LIMIT
+
+@lru_cache(maxsize=16)
+def _subsequence_sql(keyword_count):
+    """ 子序列模糊匹配的 SQL，每个关键词一个 GLOB """
+    return SEARCH_COLUMNS + " AND ".join(["search_text GLOB ?"] * keyword_count) + SEARCH_LIMIT
+
+INSERT_SQL = "INSERT INTO items (id, source_file_id, name_zh, name_en, search_text, json_data) VALUES (?, ?, ?, ?, ?, ?)"
+# 多行 VALUES 批量插入：每条语句写入 INSERT_BATCH_ROWS 行，分摊逐条语句的执行开销
+# 160 行 x 6 列 = 960 个参数，低于旧版 SQLite 的 999 个参数上限
+INSERT_BATCH_ROWS = 160
+INSERT_BATCH_SQL = (
+    "INSERT INTO items (id, source_file_id, name_zh, name_en, search_text, json_data) VALUES "
+    + ", ".join(["(?, ?, ?, ?, ?, ?)"] * INSERT_BATCH_ROWS)
+)
+
+def iter_mmap_lines(file_path, start=0, end=None):
+    """
+    通过 mmap 逐行读取文件 (bytes，不含换行符)，可只读取 [start, end) 范围 (需位于行边界)
+    换行查找由 mmap.find 在 C 层完成，省去文件对象逐行读取的缓冲拷贝
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return  # 空文件无法 mmap
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)  # 顺序读取，提示内核预读
+            if end is not None:
+                size = min(size, end)
+            pos = start
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                if end < 0:
+                    end = size
+                yield mm[pos:end]
+                pos = end + 1
+
+def split_file(file_path, chunk_bytes=PARSE_CHUNK_BYTES):
+    """ 把文件按行边界切分为约 chunk_bytes 大小的 (start, end) 区间，空文件返回空列表 """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ranges = []
+            start = 0
+            while start < size:
+                end = mm.find(b"\n", min(start + chunk_bytes, size) - 1)
+                end = size if end < 0 else end + 1
+                ranges.append((start, end))
+                start = end
+            return ranges
+
+def train_json_dict(file_paths):
+    """ 从各文件开头抽样训练 json_data 的 zstd 字典，样本不足导致训练失败时返回 None (不使用字典压缩) """
+    samples = []
+    for path in file_paths:
+        with open(path, "rb") as f:
+            for _, line in zip(range(ZSTD_SAMPLE_LINES), f):
+                line = line.strip()
+                if line:
+                    samples.append(line)
+    try:
+        return zstandard.train_dictionary(ZSTD_DICT_SIZE, samples).as_bytes()
+    except (zstandard.ZstdError, ValueError):
+        return None
+
+def parse_file(file_path, source_file_id, compress=False, zstd_dict=None, start=0, end=None):
+    """
+    解析一个 SDE jsonl 文件 (或其中 [start, end) 的一段)，返回待插入 items 表的行列表
+    定义在模块顶层，以便在 ProcessPoolExecutor 的子进程中执行
+    source_file_id 为该文件在 source_files 表中的 id
+    compress 为 True 时 json_data 用 zstd (可选字典 zstd_dict) 压缩为 bytes，否则为 str
+    """
+    rows = []
+    if compress:
+        dict_data = zstandard.ZstdCompressionDict(zstd_dict) if zstd_dict else None
+        encode = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data).compress
+    else:
+        encode = None
+    for line in iter_mmap_lines(file_path, start, end):
+        try:
+            data = _loads(line)
+            
+            item_id = data.get("_key") or data.get("id") or data.get("typeID")
+            item_id_str = str(item_id) if item_id is not None else ""
+            
+            # name 绝大多数是 dict，type() 比较比 isinstance 更快
+            name_data = data.get("name")
+            t = type(name_data)
+            if t is dict:
+                name_en = name_data.get("en") or ""
+                name_zh = name_data.get("zh") or ""
+            elif t is str:
+                name_en = name_zh = name_data
+            else:
+                name_en = name_zh = ""
+            
+            rows.append((
+                item_id_str,
+                source_file_id,
+                name_zh,
+                name_en,
+                normalize_text(f"{item_id_str} {name_zh} {name_en}"),
+                encode(line.strip()) if encode else line.strip().decode("utf-8")
+            ))
+        except (ValueError, AttributeError):
+            continue # 空行、损坏的行或不是对象的行
+    return rows
 
 class EveDB:
-    def __init__(self, db_path="eve_sde.db"):
+    """
+    SDE 索引数据库
+    查询方法 (search / get_json / get_count) 复用同一个连接，页缓存在多次查询之间保持热度，
+    连接可跨线程使用，查询由 self.lock 串行化；
+    建库方法 (init_db / clear_db / build_index) 结束时关闭连接，批量写入参数不会残留
+    """
+    def __init__(self, db_path="eve_sde.db", read_only=False):
         self.db_path = db_path
+        self.read_only = read_only # 只用于搜索/详情的查询连接，打开后设置 query_only
         self.conn = None
+        self.fts_available = None # 是否存在 FTS 表，查询连接上首次搜索时检查
+        self.source_names = None # source_files 的 id -> 文件名，查询连接上首次搜索时读取
+        self.decompressor = None # 带 meta 字典的 zstd 解压器，首次读取压缩 json_data 时创建
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def connect(self):
-        # 增加 timeout 避免 locked
-        self.conn = sqlite3.connect(self.db_path, timeout=30.0)
-        self.conn.row_factory = sqlite3.Row
+        """ 打开连接 (已打开时直接复用) """
+        if self.conn is None:
+            # 增加 timeout 避免 locked
+            self.conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            for pragma in CONNECT_PRAGMAS:
+                self.conn.execute(pragma)
+            if self.read_only:
+                # journal_mode 等需要写入，query_only 放在最后设置
+                self.conn.execute("PRAGMA query_only=1")
+        return self.conn
 
     def close(self):
-        if self.conn:
-            self.conn.close()
+        with self.lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+            self.fts_available = None
+            self.source_names = None
+            self.decompressor = None
 
     def init_db(self):
         self.connect()
         try:
             cursor = self.conn.cursor()
+            # 旧版结构无法原地转换，删除后由 build_index 重新写入 (外部内容 FTS 表依赖 items，先删)
+            if cursor.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                cursor.execute("DROP TABLE IF EXISTS items_fts")
+                cursor.execute("DROP TABLE IF EXISTS items")
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             # Main data table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS items (
                     id TEXT,
-                    source_file TEXT,
+                    source_file_id INTEGER,
                     name_zh TEXT,
                     name_en TEXT,
-                    search_text TEXT,
-                    json_data TEXT
+                    -- 搜索文本 (ID + 中英文名) 建库时由 normalize_text 计算：
+                    -- SQLite 的 lower() 只处理 ASCII 且不做 NFKC，必须与查询关键词走同一个 Python 函数
+                    search_text TEXT COLLATE BINARY,
+                    json_data BLOB
                 )
             ''')
-            # Index for faster lookup by ID
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_id ON items(id)')
-            # Index for exact name match (optional)
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_name_zh ON items(name_zh)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_name_en ON items(name_en)')
+            # 来源文件名只存一份，items 中保存其 id
+            cursor.execute("CREATE TABLE IF NOT EXISTS source_files (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)")
+            # 元数据表，保存 json_data 的压缩字典等
+            cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB)")
+            self.create_indexes()
+            # 倒排索引 (FTS5 trigram)：子串搜索不必再全表扫描 search_text
+            # 使用外部内容表 (content='items')，FTS 只保存倒排索引，不再重复存一份 search_text
+            # 旧版 SQLite 不支持 trigram 时跳过，搜索会自动退回 GLOB 逐行匹配
+            row = cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'items_fts'").fetchone()
+            if row and "content=" not in row[0]:
+                cursor.execute("DROP TABLE items_fts") # 旧版自带内容的 FTS 表，重建为外部内容表
+            try:
+                cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(search_text, content='items', content_rowid='rowid', tokenize='trigram')")
+            except sqlite3.OperationalError as e:
+                print(f"FTS5 trigram unavailable, falling back to GLOB search: {e}")
             
             self.conn.commit()
         finally:
@@ -45,6 +375,9 @@ class EveDB:
         self.connect()
         try:
             self.conn.execute("DELETE FROM items")
+            self.conn.execute("DELETE FROM source_files")
+            if self.has_fts():
+                self.conn.execute("INSERT INTO items_fts(items_fts) VALUES('delete-all')")
             self.conn.commit() # 提交删除事务
             
             # VACUUM 必须在无事务状态下运行
@@ -63,68 +396,57 @@ class EveDB:
         """
         self.connect()
         try:
-            # Python sqlite3 会在执行 DML (INSERT) 时自动开启事务
-            # 我们只需要最后 commit 即可确保所有插入在一个事务中（提高速度）
-            # self.conn.execute("BEGIN TRANSACTION") # 不需要手动开启，避免冲突
+            for pragma in BULK_LOAD_PRAGMAS:
+                self.conn.execute(pragma)
+            # 整个重建显式放在一个写事务中，只在最后 commit 一次
+            # (journal_mode 等 PRAGMA 不能在事务中修改，需在 BEGIN 之前执行)
+            self.conn.execute("BEGIN IMMEDIATE")
+            # 写入期间不维护索引，全部插入后一次性排序建索引要快得多
+            self.drop_indexes()
             
             # Clear existing data first? Or assume this is called after clear_db
             # Let's just clear specific files if we were doing incremental, but here we do full rebuild
             
-            files = [f for f in os.listdir(sde_dir) if f.endswith(".jsonl")]
+            with os.scandir(sde_dir) as it:
+                files = [e.name for e in it if e.name.endswith(".jsonl") and e.is_file()]
             total_files = len(files)
             
-            for idx, file_name in enumerate(files):
-                file_path = os.path.join(sde_dir, file_name)
-                
-                if progress_callback:
-                    progress_callback(file_name, idx + 1, total_files)
-                
-                with open(file_path, "r", encoding="utf-8") as f:
-                    batch = []
-                    for line in f:
-                        try:
-                            data = json.loads(line)
-                            
-                            item_id = data.get("_key") or data.get("id") or data.get("typeID")
-                            item_id_str = str(item_id) if item_id is not None else ""
-                            
-                            name_data = data.get("name", {})
-                            name_en = ""
-                            name_zh = ""
-                            
-                            if isinstance(name_data, dict):
-                                name_en = name_data.get("en", "")
-                                name_zh = name_data.get("zh", "")
-                            elif isinstance(name_data, str):
-                                name_en = name_data
-                                name_zh = name_data
-                                
-                            # Pre-compute search text (lowercase)
-                            search_text = f"{item_id_str} {name_zh} {name_en}".lower()
-                            
-                            batch.append((
-                                item_id_str,
-                                file_name,
-                                name_zh,
-                                name_en,
-                                search_text,
-                                line.strip()
-                            ))
-                            
-                            if len(batch) >= 1000:
-                                self.conn.executemany(
-                                    "INSERT INTO items (id, source_file, name_zh, name_en, search_text, json_data) VALUES (?, ?, ?, ?, ?, ?)",
-                                    batch
-                                )
-                                batch = []
-                        except:
-                            continue
-                            
-                    if batch:
-                        self.conn.executemany(
-                            "INSERT INTO items (id, source_file, name_zh, name_en, search_text, json_data) VALUES (?, ?, ?, ?, ?, ?)",
-                            batch
-                        )
+            # 安装了 zstandard 时先抽样训练字典，各子进程用同一字典压缩 json_data
+            compress = zstandard is not None
+            zstd_dict = train_json_dict([os.path.join(sde_dir, f) for f in files]) if compress else None
+            self.conn.execute("DELETE FROM meta WHERE key = 'zstd_dict'")
+            if zstd_dict:
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('zstd_dict', ?)", (zstd_dict,))
+            
+            # 各文件按行边界切成若干段在子进程中并行解析，SQLite 只允许一个写者，由当前连接统一写入
+            # 在途任务数有上限，按提交顺序取回结果，行的写入顺序 (rowid) 与文件内容一致
+            tasks = []
+            for f in files:
+                path = os.path.join(sde_dir, f)
+                source_file_id = self.add_source_file(f)
+                ranges = split_file(path) or [(0, 0)]
+                for i, (start, end) in enumerate(ranges):
+                    # 每个文件的最后一段完成时报告进度
+                    last_of = f if i == len(ranges) - 1 else None
+                    tasks.append((last_of, (path, source_file_id, compress, zstd_dict, start, end)))
+            workers = max(1, min(len(tasks), os.cpu_count() or 1))
+            # 建库在 GUI 的 QThread 中进行，Linux 默认的 fork 会复制持有锁的多线程进程，子进程可能死锁，统一用 spawn
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                pending = deque()
+                files_done = 0
+                for last_of, args in tasks:
+                    pending.append((last_of, executor.submit(parse_file, *args)))
+                    if len(pending) < workers * PARSE_TASKS_PER_WORKER:
+                        continue
+                    files_done = self._insert_parsed(pending.popleft(), files_done, total_files, progress_callback)
+                while pending:
+                    files_done = self._insert_parsed(pending.popleft(), files_done, total_files, progress_callback)
+            
+            self.create_indexes()
+            
+            # 数据全部写入后从 items 一次性重建倒排索引，rowid 与 items 一一对应
+            if self.has_fts():
+                self.conn.execute("INSERT INTO items_fts(items_fts) VALUES('rebuild')")
             
             self.conn.commit()
             return True
@@ -135,43 +457,149 @@ class EveDB:
         finally:
             self.close()
 
-    def search(self, keyword, limit=1000):
-        self.connect()
-        try:
-            keyword = keyword.lower().strip()
+    def _insert_parsed(self, task, files_done, total_files, progress_callback):
+        """ 写入一个解析任务的结果，文件全部写完时回调进度，返回已完成的文件数 """
+        last_of, future = task
+        self.insert_rows(future.result())
+        if last_of is not None:
+            files_done += 1
+            if progress_callback:
+                progress_callback(last_of, files_done, total_files)
+        return files_done
+
+    def add_source_file(self, name):
+        """ 登记来源文件名并返回其 id (需要已打开的连接) """
+        self.conn.execute("INSERT OR IGNORE INTO source_files (name) VALUES (?)", (name,))
+        return self.conn.execute("SELECT id FROM source_files WHERE name = ?", (name,)).fetchone()[0]
+
+    def insert_rows(self, rows):
+        """ 写入 items 行 (需要已打开的连接)：整批部分用多行 VALUES，剩余不足一批的用 executemany """
+        full = len(rows) - len(rows) % INSERT_BATCH_ROWS
+        for start in range(0, full, INSERT_BATCH_ROWS):
+            self.conn.execute(INSERT_BATCH_SQL, list(chain.from_iterable(rows[start:start + INSERT_BATCH_ROWS])))
+        if full < len(rows):
+            self.conn.executemany(INSERT_SQL, rows[full:])
+
+    def create_indexes(self):
+        """ 创建普通索引 (需要已打开的连接) """
+        for _, sql in INDEXES:
+            self.conn.execute(sql)
+
+    def drop_indexes(self):
+        """ 删除普通索引 (需要已打开的连接) """
+        for name, _ in INDEXES:
+            self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def needs_rebuild(self):
+        """ 数据库结构是否早于当前版本 (需要重建索引后才能搜索) """
+        with self.lock:
+            self.connect()
+            return self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION
+
+    def has_fts(self):
+        """ 数据库中是否存在 FTS5 倒排索引 (旧库或旧版 SQLite 中没有) """
+        row = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'").fetchone()
+        return row is not None
+
+    def search(self, keyword, limit=1000, candidates=None):
+        """
+        搜索条目，多个关键词为 AND 逻辑
+        candidates: 可选的 rowid 列表 (如上一次较短查询的完整结果)，只在这些行中查找
+        """
+        with self.lock:
+            self.connect()
+            keyword = normalize_text(keyword).strip()
             keywords = keyword.split()
             
-            # Build query dynamically for multiple keywords (AND logic)
-            query = "SELECT * FROM items WHERE "
+            # Build query for multiple keywords (AND logic)
+            # SQL 只取决于各类条件的数量，由 _search_sql 缓存，连接的语句缓存可以复用已编译的语句
             params = []
+            # trigram 索引只能匹配长度 >= 3 的子串，更短的关键词仍用 GLOB 过滤候选行
+            if self.fts_available is None:
+                self.fts_available = self.has_fts()
+            if self.source_names is None:
+                self.source_names = dict(self.conn.execute("SELECT id, name FROM source_files").fetchall())
+            # 有候选集时 (最多 limit 行) 由候选 rowid 驱动查询，逐行 GLOB 即可；
+            # 若仍加上 FTS 条件，查询计划会先遍历 FTS 的全部命中 (常见三元组可达数十万行) 再逐一检查候选集
+            fts_keywords = [kw for kw in keywords if len(kw) >= 3] if self.fts_available and candidates is None else []
+            if fts_keywords:
+                params.append(" AND ".join('"' + kw.replace('"', '""') + '"' for kw in fts_keywords))
+            glob_keywords = [kw for kw in keywords if kw not in fts_keywords]
+            params.extend(f"*{glob_escape(kw)}*" for kw in glob_keywords)
+            if candidates is not None:
+                params.append(json.dumps(list(candidates)))
+            # 候选池取前 pool_size 个命中，再在 Python 中按匹配得分选出前 limit 个
+            # (命中少于 pool_size 时候选池就是全部结果，排序与全量排序一致)
+            pool_size = limit * RANK_POOL_FACTOR
+            params.append(pool_size)
             
-            conditions = []
-            for kw in keywords:
-                conditions.append("search_text LIKE ?")
-                params.append(f"%{kw}%")
-                
-            query += " AND ".join(conditions)
-            query += f" LIMIT {limit}"
+            query = _search_sql(bool(fts_keywords), len(glob_keywords), candidates is not None)
+            rows = self.conn.execute(query, params).fetchall()
+            
+            # 纯数字关键词可能是条目 ID：宽泛的数字命中很多行时候选池会被截断，ID 命中的条目可能不在其中，
+            # 因此再按索引做一次等值查找并入候选池 (有候选集时结果本来就是完整的，无需补查)
+            if candidates is None and len(keywords) == 1 and keyword.isdigit():
+                seen = {row["rowid"] for row in rows}
+                rows.extend(row for row in self.conn.execute(SEARCH_BY_ID_SQL, (keyword,)) if row["rowid"] not in seen)
+            
+            # 子串无结果时退回模糊匹配：关键词按子序列匹配 (如 "高辟邪" 可匹配 "高级辟邪")
+            # 逐字插入通配符交给 SQLite 的 GLOB 在 C 层完成双指针扫描
+            # 子序列匹配的行不一定在候选集 (子串结果) 中，因此模糊匹配总是查全表
+            if not rows and any(len(kw) > 1 for kw in keywords):
+                params = [self._subsequence_pattern(kw) for kw in keywords]
+                params.append(pool_size)
+                rows = self.conn.execute(_subsequence_sql(len(keywords)), params).fetchall()
+            
+            # 按得分取前 limit 个 (有界堆)，同分时名称越短越靠前
+            rows = heapq.nlargest(limit, rows, key=lambda r: (score_row(r, keywords), -len(r["search_text"])))
             
-            cursor = self.conn.execute(query, params)
             results = []
-            for row in cursor:
+            for row in rows:
                 results.append({
+                    "rowid": row["rowid"],
                     "id": row["id"],
-                    "file_name": row["source_file"],
+                    "file_name": self.source_names.get(row["source_file_id"]),
                     "name_zh": row["name_zh"],
-                    "name_en": row["name_en"],
-                    "json_data": row["json_data"]
+                    "name_en": row["name_en"]
                 })
                 
             return results
-        finally:
-            self.close()
+
+    @staticmethod
+    def _subsequence_pattern(keyword):
+        """ 生成子序列匹配的 GLOB 模式："abc" -> "*a*b*c*"，转义关键词中的通配符 """
+        return "*" + "*".join(glob_escape(c) for c in keyword) + "*"
+
+    def get_json(self, rowid, item_id, source_file):
+        """
+        按 rowid 读取条目的完整 JSON (未压缩时为 str，zstd 压缩的返回解压后的 UTF-8 bytes)
+        同时校验 id 和来源文件，索引重建后 rowid 变化时返回 None 而不是错误的条目
+        """
+        with self.lock:
+            self.connect()
+            row = self.conn.execute(GET_JSON_SQL, (rowid, item_id, source_file)).fetchone()
+            if row is None:
+                return None
+            data = row["json_data"]
+            if isinstance(data, bytes):
+                data = self._decompress_json(data)
+            return data
+
+    def _decompress_json(self, blob):
+        """ 解压 zstd 压缩的 json_data 为 UTF-8 bytes (需要已打开的连接)，缺少 zstandard 时返回 None """
+        if zstandard is None:
+            print("json_data is zstd-compressed but zstandard is not installed")
+            return None
+        with self.lock:
+            # 字典在重建前不会变化，解压器只创建一次；重建后 close() 会清空，下次按新字典重新创建
+            if self.decompressor is None:
+                row = self.conn.execute("SELECT value FROM meta WHERE key = 'zstd_dict'").fetchone()
+                dict_data = zstandard.ZstdCompressionDict(row["value"]) if row else None
+                self.decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+            return self.decompressor.decompress(blob)
 
     def get_count(self):
-        self.connect()
-        try:
+        with self.lock:
+            self.connect()
             cursor = self.conn.execute("SELECT COUNT(*) FROM items")
             return cursor.fetchone()[0]
-        finally:
-            self.close()
@@ -11,6 +11,17 @@ Created: 2026
 
 import os
 import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# 优先使用 orjson (C 实现，直接解析 bytes)，未安装时回退到标准库 json
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
 
 # 获取当前脚本或 EXE 所在的目录
 if getattr(sys, 'frozen', False):
@@ -23,81 +34,153 @@ else:
 # SDE 数据目录 (默认为当前目录下的 eve_sde_jsonl)
 SDE_DIR = os.path.join(BASE_DIR, "eve_sde_jsonl")
 
-def search_in_file(keyword, file_name):
+def list_jsonl_files(directory):
+    """ 列出目录下的 .jsonl 文件名 (scandir 直接带回类型信息，无需逐个 stat) """
+    with os.scandir(directory) as it:
+        return [e.name for e in it if e.name.endswith(".jsonl") and e.is_file()]
+
+# 按块读取文件的大小 (1 MiB)
+READ_BLOCK = 1 << 20
+
+def iter_lines(file_path, block_size=READ_BLOCK):
+    """
+    以二进制块读取文件并切分为行 (bytes)，跨块的半行留到下一块拼接
+    省去文本模式逐行解码和换行转换的开销，json 可直接解析 bytes
+    """
+    with open(file_path, "rb") as f:
+        tail = b""
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            lines = (tail + block).split(b"\n")
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
+
+# ASCII 大写 -> 小写的字节转换表，bytes.translate 在 C 层单趟完成，无需先解码
+_ASCII_LETTERS = b"abcdefghijklmnopqrstuvwxyz"
+_LOWER = bytes.maketrans(_ASCII_LETTERS.upper(), _ASCII_LETTERS)
+
+def build_prefilter(keyword):
+    """
+    生成原始行 (bytes) 的预筛函数，返回 False 的行一定不匹配，可以跳过 JSON 解析
+    关键词整体作为一个短语，只在其大小写可由 _LOWER 处理时 (ASCII 或无大小写的中文等) 使用
+    不含 ASCII 字母的关键词 (如中文、数字) 直接在原始行中查找，无需先复制一份小写行；
+    实测 re.IGNORECASE 比 translate + in 更慢，因此含字母的关键词仍用 translate
+    含转义 (如 \\uXXXX) 的行无法按字节判断，一律放行交给完整匹配
+    """
+    phrase = keyword.lower()
+    if not phrase or not all(c.isascii() or c.lower() == c.upper() for c in phrase):
+        return None
+    kw = phrase.encode("utf-8")
+
+    if not any(b in _ASCII_LETTERS for b in kw):
+        return lambda line: kw in line or b"\\" in line
+    return lambda line: kw in line.translate(_LOWER) or b"\\" in line
+
+def build_matcher(keyword):
+    """
+    将关键词预编译为匹配函数 matcher(text) -> bool (text 为小写的单个名称)
+    关键词整体作为一个短语做子串匹配，不按空格拆分 ("Caldari Navy" 只匹配包含该短语的名称)
+    """
+    phrase = keyword.lower()
+    return lambda text: phrase in text
+
+def search_in_file(keyword, file_name, matcher=None, sde_dir=None):
     """
     在指定的 JSONL 文件中搜索关键词
     返回匹配到的行列表 (id, zh_name, en_name)
+    sde_dir 默认为 SDE_DIR；子进程中需显式传入 (spawn 方式启动的子进程看不到主进程对 SDE_DIR 的修改)
     """
-    file_path = os.path.join(SDE_DIR, file_name)
+    file_path = os.path.join(sde_dir or SDE_DIR, file_name)
     results = []
-    keyword_lower = keyword.lower()
+    if matcher is None:
+        matcher = build_matcher(keyword)
+    prefilter = build_prefilter(keyword)
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    data = json.loads(line)
-                    
-                    # 尝试获取 ID (支持 _key, id, typeID 等常见字段)
-                    item_id = data.get("_key") or data.get("id") or data.get("typeID")
-                    
-                    # 获取 name 字典
-                    name_data = data.get("name", {})
-                    
-                    name_en = ""
-                    name_zh = ""
-                    
-                    # 处理不同格式的 name
-                    if isinstance(name_data, dict):
-                        name_en = name_data.get("en", "")
-                        name_zh = name_data.get("zh", "")
-                    elif isinstance(name_data, str):
-                        name_en = name_data
-                        name_zh = name_data
-                    
-                    # 如果没有名字，跳过 (或者可以搜索其他字段，暂时只搜名字)
-                    if not name_en and not name_zh:
-                        continue
-
-                    # 检查匹配 (忽略大小写)
-                    if keyword_lower in name_en.lower() or keyword_lower in name_zh.lower():
-                        results.append((item_id, name_zh, name_en))
-
-                except json.JSONDecodeError:
+        for line in iter_lines(file_path):
+            if not line.strip():
+                continue
+            # 先在字节层面粗筛，大部分不相关的行不再解析 JSON
+            if prefilter and not prefilter(line):
+                continue
+            try:
+                data = _loads(line)
+                
+                # 尝试获取 ID (支持 _key, id, typeID 等常见字段)
+                item_id = data.get("_key") or data.get("id") or data.get("typeID")
+                
+                # 获取 name 字典
+                name_data = data.get("name")
+                
+                # 处理不同格式的 name (绝大多数是 dict，type() 比较比 isinstance 更快)
+                t = type(name_data)
+                if t is dict:
+                    name_en = name_data.get("en") or ""
+                    name_zh = name_data.get("zh") or ""
+                elif t is str:
+                    name_en = name_zh = name_data
+                else:
+                    name_en = name_zh = ""
+                
+                # 如果没有名字，跳过 (或者可以搜索其他字段，暂时只搜名字)
+                if not name_en and not name_zh:
                     continue
+
+                # 检查匹配 (忽略大小写)，短语需完整出现在英文名或中文名之一中
+                if matcher(name_en.lower()) or matcher(name_zh.lower()):
+                    results.append((item_id, name_zh, name_en))
+
+            except ValueError:
+                continue
     except Exception as e:
         # print(f"读取文件 {file_name} 出错: {e}") # 忽略读取错误，避免刷屏
         pass
 
     return results
 
+def print_matches(file_name, matches):
+    """ 打印单个文件的匹配结果 """
+    if matches:
+        print(f"📄 文件: {file_name} (找到 {len(matches)} 项)")
+        print("-" * 70)
+        print(f"{'ID':<15} | {'中文名':<25} | {'英文名':<25}")
+        print("-" * 70)
+        
+        for item_id, name_zh, name_en in matches:
+            # 截断过长的名称
+            display_zh = (name_zh[:23] + '..') if len(name_zh) > 23 else name_zh
+            display_en = (name_en[:23] + '..') if len(name_en) > 23 else name_en
+            # 处理 ID 为 None 的情况
+            display_id = str(item_id) if item_id is not None else "N/A"
+            
+            print(f"{display_id:<15} | {display_zh:<25} | {display_en:<25}")
+        
+        print("=" * 70 + "\n")
+
+def available_cpu_count():
+    """ 当前进程可用的 CPU 数 (考虑 CPU 亲和性限制，不支持时退回 cpu_count) """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
 def search_all_files(keyword):
     print(f"正在全库搜索 '{keyword}' ... (这可能需要几秒钟)")
     print("=" * 70)
 
     total_found = 0
-    files = [f for f in os.listdir(SDE_DIR) if f.endswith(".jsonl")]
+    files = list_jsonl_files(SDE_DIR)
     
-    for file_name in files:
-        matches = search_in_file(keyword, file_name)
-        
-        if matches:
+    # JSON 解析受 GIL 限制，多个文件用多进程并行扫描 (每个进程自行构建匹配函数)，按文件顺序输出结果
+    workers = max(1, min(len(files), available_cpu_count()))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        all_matches = executor.map(partial(search_in_file, keyword, sde_dir=SDE_DIR), files, chunksize=4)
+        for file_name, matches in zip(files, all_matches):
+            print_matches(file_name, matches)
             total_found += len(matches)
-            print(f"📄 文件: {file_name} (找到 {len(matches)} 项)")
-            print("-" * 70)
-            print(f"{'ID':<15} | {'中文名':<25} | {'英文名':<25}")
-            print("-" * 70)
-            
-            for item_id, name_zh, name_en in matches:
-                # 截断过长的名称
-                display_zh = (name_zh[:23] + '..') if len(name_zh) > 23 else name_zh
-                display_en = (name_en[:23] + '..') if len(name_en) > 23 else name_en
-                # 处理 ID 为 None 的情况
-                display_id = str(item_id) if item_id is not None else "N/A"
-                
-                print(f"{display_id:<15} | {display_zh:<25} | {display_en:<25}")
-            
-            print("=" * 70 + "\n")
 
     if total_found == 0:
         print("未找到任何匹配项。")
@@ -105,6 +188,7 @@ def search_all_files(keyword):
         print(f"全库搜索完成，共找到 {total_found} 个匹配项。")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # 打包为 exe 后子进程需要
     if len(sys.argv) > 1:
         search_keyword = " ".join(sys.argv[1:])
     else:
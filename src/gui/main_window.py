@@ -12,16 +12,45 @@ Created: 2026
 import sys
 import os
 import json
-import shutil
-import zipfile
+import sqlite3
+import time
+from collections import OrderedDict
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                             QHBoxLayout, QLineEdit, QPushButton, QTableWidget, 
-                             QTableWidgetItem, QHeaderView, QLabel, QMessageBox,
+                             QHBoxLayout, QLineEdit, QPushButton, QTableView,
+                             QHeaderView, QLabel, QMessageBox,
                              QProgressBar, QMenu, QTextEdit, QTreeWidget, QTreeWidgetItem,
                              QListWidget, QAction, QTabWidget, QSplitter, QGroupBox, QFormLayout, QTextBrowser)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QIcon, QFont, QCursor
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QIcon, QFont, QCursor, QColor, QBrush
+
+# 优先使用 orjson 解析 (C 实现，可直接解析 bytes)，未安装时回退到标准库 json
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps # 直接得到 UTF-8 bytes，写入二进制文件无需再编码
+
+    def _dumps_pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode("utf-8")
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def _dumps_pretty(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=True)
+
+# 可选依赖：pysimdjson，变更日志只需读取少数几个顶层字段，按需访问而不必把整条记录转换为 Python 对象
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
 
 # 尝试导入 eve_search 中的配置和函数
 try:
@@ -32,7 +61,8 @@ try:
 except ImportError:
     eve_search = None
 
-# 定义获取 SDE 目录的辅助函数
+# 定义获取 SDE 目录的辅助函数 (路径在运行期间不变，结果缓存)
+@lru_cache(maxsize=None)
 def get_base_dir():
     if getattr(sys, 'frozen', False):
         return os.path.dirname(sys.executable)
@@ -40,12 +70,14 @@ def get_base_dir():
     # main_window.py 在 src/gui/ 下，所以需要往上找两级
     return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+@lru_cache(maxsize=None)
 def get_resource_path(relative_path):
     """ 获取资源文件的绝对路径 (支持开发环境和打包环境) """
     if hasattr(sys, '_MEIPASS'):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(get_base_dir(), relative_path)
 
+@lru_cache(maxsize=None)
 def get_sde_dir():
     if eve_search:
         # 确保 eve_search 使用正确的 SDE 路径
@@ -53,7 +85,69 @@ def get_sde_dir():
         return eve_search.SDE_DIR
     return os.path.join(get_base_dir(), "eve_sde_jsonl")
 
+# 索引数据库路径
+DB_PATH = os.path.join(get_base_dir(), "data", "eve_sde.db")
+
 from src.core import eve_db
+from src.core import eve_SDE
+# 按块读取 JSONL 并切分为行 (bytes)，与命令行搜索共用
+from src.core.eve_search import iter_lines
+
+# 详情窗口中 ID 字段的名称查询：共用一个只读连接，结果缓存在 _ID_CACHE (id 字符串 -> 名称或 None)
+ID_NAME_BATCH = 500 # 每条 IN 查询的参数个数，低于 SQLite 的参数上限
+_ID_CONN = None
+_ID_CACHE = {}
+
+def _id_name_conn():
+    """ 名称查询连接 (首次使用时打开)，数据库不存在时返回 None """
+    global _ID_CONN
+    if _ID_CONN is None:
+        if not os.path.exists(DB_PATH):
+            return None
+        _ID_CONN = sqlite3.connect(DB_PATH, timeout=5)
+        _ID_CONN.execute("PRAGMA query_only=1")
+        _ID_CONN.execute("PRAGMA cache_size=-20000")
+    return _ID_CONN
+
+def prefetch_id_names(ids):
+    """ 批量查询尚未缓存的 ID 名称并写入缓存 """
+    keys = list({str(i) for i in ids if i and str(i) != "0"} - _ID_CACHE.keys())
+    if not keys:
+        return
+    conn = _id_name_conn()
+    if conn is None:
+        return
+    found = {}
+    for start in range(0, len(keys), ID_NAME_BATCH):
+        chunk = keys[start:start + ID_NAME_BATCH]
+        placeholders = ",".join("?" * len(chunk))
+        for item_id, zh, en in conn.execute(f"SELECT id, name_zh, name_en FROM items WHERE id IN ({placeholders})", chunk):
+            if not found.get(item_id):
+                found[item_id] = zh or en or None
+    for key in keys:
+        _ID_CACHE[key] = found.get(key)
+
+def reset_id_names():
+    """ 关闭名称查询连接并清空缓存 (重建索引前调用) """
+    global _ID_CONN
+    if _ID_CONN is not None:
+        _ID_CONN.close()
+        _ID_CONN = None
+    _ID_CACHE.clear()
+
+# 所有独立窗口 (详情、变更日志) 的引用都放在模块级集合中，不随打开它的窗口一起销毁：
+# 关闭变更日志窗口时，从它打开的详情窗口仍然保留
+_OPEN_WINDOWS = set()
+
+def _forget_window(window, _obj=None):
+    _OPEN_WINDOWS.discard(window)
+
+def keep_window(window):
+    """ 保持对独立窗口的引用，窗口关闭时销毁并自动移出集合 """
+    window.setAttribute(Qt.WA_DeleteOnClose)
+    _OPEN_WINDOWS.add(window)
+    # 用 partial 绑定模块级函数，不在闭包的默认参数里引用窗口 (循环引用被 GC 清理后会以缺参调用)
+    window.destroyed.connect(partial(_forget_window, window))
 
 class IndexWorker(QThread):
     """
@@ -65,8 +159,7 @@ class IndexWorker(QThread):
     def run(self):
         try:
             self.progress.emit("正在初始化数据库...", 0)
-            db_path = os.path.join(get_base_dir(), "data", "eve_sde.db")
-            db = eve_db.EveDB(db_path)
+            db = eve_db.EveDB(DB_PATH)
             db.init_db()
             db.clear_db()
             
@@ -89,34 +182,38 @@ class SearchWorker(QThread):
     """
     后台搜索线程 (DB版)
     """
-    result_found = pyqtSignal(str, str, str, str, str)  # 信号：文件名, ID, 中文名, 英文名, 完整JSON字符串
+    results_batch = pyqtSignal(list)  # 信号：一批结果 [(文件名, ID, 中文名, 英文名, rowid), ...]
     finished = pyqtSignal(int)  # 信号：总找到的数量
     error = pyqtSignal(str) # 信号：错误信息
 
-    def __init__(self, keyword):
+    LIMIT = 1000
+
+    def __init__(self, db, keyword, candidates=None):
         super().__init__()
+        self.db = db # 主窗口持有的 EveDB，连接在多次搜索之间复用
         self.keyword = keyword
+        self.candidates = candidates # 可选：只在这些 rowid 中搜索
         self.is_running = True
 
     def run(self):
         try:
-            db_path = os.path.join(get_base_dir(), "data", "eve_sde.db")
-            db = eve_db.EveDB(db_path)
+            db = self.db
             if not os.path.exists(db.db_path):
                  self.error.emit("索引数据库不存在，请先构建索引。")
                  return
                  
-            results = db.search(self.keyword)
+            results = db.search(self.keyword, self.LIMIT, self.candidates)
             
-            for res in results:
-                if not self.is_running: break
-                self.result_found.emit(
+            # db.search 已一次性返回全部结果 (最多 LIMIT 条)，整体作为一批发送，只跨线程传递一次；
+            # 模型再通过 fetchMore 分段展示给视图
+            if self.is_running and results:
+                self.results_batch.emit([(
                     res["file_name"], 
                     str(res["id"]), 
                     res["name_zh"], 
                     res["name_en"], 
-                    res["json_data"]
-                )
+                    res["rowid"]
+                ) for res in results])
                 
             self.finished.emit(len(results))
             
@@ -132,12 +229,37 @@ class UpdateWorker(QThread):
     """
     progress = pyqtSignal(str) # 进度消息
     finished = pyqtSignal(bool, str) # 是否成功, 消息
+
+    PROGRESS_INTERVAL = 0.1 # 高频进度消息最多每 0.1 秒发送一次
+    DOWNLOAD_SPOOL_SIZE = 256 << 20 # 下载的压缩包在内存中最多保留 256 MiB
+    WRITE_BUFFER = 1 << 20 # 变更文件的写缓冲 (1 MiB)，减少逐条记录触发的 write 系统调用
+    DOWNLOAD_CHUNK = 256 << 10 # 下载时每次读取的块大小 (256 KiB)
+    SCAN_WORKERS = 8 # 生成变更日志时并行读取源表的线程数
+    HTTP_TIMEOUT = (5, 30) # 连接 / 读取超时 (秒)
     
+    def throttled_progress(self, msg):
+        """ 限频发送进度消息，避免逐条变更刷新界面 """
+        now = time.monotonic()
+        if now - getattr(self, "_last_progress", 0.0) >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress.emit(msg)
+
     def run(self):
+        # 三个阶段共用一个 Session，复用 TCP/TLS 连接
+        self.session = requests.Session()
+        # 连接失败或网关临时错误 (502/503/504) 时按指数退避自动重试
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=4, pool_maxsize=4,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))))
+        executor = ThreadPoolExecutor(max_workers=1)
+        changes_future = None
         try:
             self.progress.emit("正在检查最新版本信息...")
             latest_key, latest_buildNumber, latest_releaseDate = self.read_SDE_latest_info()
             
+            # 变更列表与数据包下载互不依赖，先在后台线程中并发获取
+            changes_future = executor.submit(self.fetch_changes, latest_buildNumber)
+            
             sde_dir = get_sde_dir()
             current_buildNumber = None
             
@@ -147,7 +269,7 @@ class UpdateWorker(QThread):
                 try:
                     with open(sde_meta_path, "r", encoding="utf-8") as f:
                         line = f.readline()
-                        data = json.loads(line)
+                        data = _loads(line)
                         current_buildNumber = data.get("buildNumber")
                 except:
                     pass
@@ -161,50 +283,93 @@ class UpdateWorker(QThread):
             
             # 生成变更日志
             self.progress.emit("正在获取变更详细信息...")
-            self.get_SDE_update(latest_buildNumber, latest_releaseDate)
+            self.get_SDE_update(latest_buildNumber, latest_releaseDate, changes_future.result())
             
             self.finished.emit(True, f"更新流程结束。最新版本: {latest_buildNumber}")
             
         except Exception as e:
             self.finished.emit(False, f"更新失败: {str(e)}")
+        finally:
+            # 先取消/等待后台的变更列表请求，再关闭它正在使用的 Session
+            # (shutdown 的 cancel_futures 参数需要 Python 3.9+，这里手动取消)
+            if changes_future is not None:
+                changes_future.cancel()
+            executor.shutdown(wait=True)
+            self.session.close()
 
     def read_SDE_latest_info(self):
         url = "https://developers.eveonline.com/static-data/tranquility/latest.jsonl"
-        response = requests.get(url, stream=True).json()
-        return response['_key'], response['buildNumber'], response['releaseDate']
+        # 版本信息在 jsonl 的第一行，流式读取到第一行就关闭连接，不必下载并解析整个响应体
+        with self.session.get(url, stream=True, timeout=self.HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            data = _loads(next(response.iter_lines(chunk_size=4096)))
+        return data['_key'], data['buildNumber'], data['releaseDate']
 
     def download_latest_eve_SDE_json(self):
         url = "https://developers.eveonline.com/static-data/eve-online-static-data-latest-jsonl.zip"
-        filename = "eve_SDE_jsonl.zip"
         base_dir = get_base_dir()
-        file_path = os.path.join(base_dir, filename)
         
         self.progress.emit("正在下载 eve_SDE_jsonl.zip ...")
-        response = requests.get(url, stream=True)
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(response.raw, f)
-            
-        self.progress.emit("下载完成，正在解压...")
+        response = self.session.get(url, stream=True, timeout=self.HTTP_TIMEOUT)
+        response.raise_for_status()
         extract_path = os.path.join(base_dir, "eve_sde_jsonl")
         
         # 确保目录存在
         if not os.path.exists(extract_path):
             os.makedirs(extract_path)
+        
+        if eve_SDE.stream_unzip is not None:
+            # 安装了 stream_unzip 时边下载边解压，压缩包既不落盘也不整体留在内存中
+            self.progress.emit("正在边下载边解压...")
+            eve_SDE.stream_extract(self.iter_download(response), extract_path)
+        else:
+            # 压缩包先放在内存中 (超过 DOWNLOAD_SPOOL_SIZE 才落到匿名临时文件)，
+            # 解压直接读取该缓冲区，省去写入 zip 文件、重新读取再删除的磁盘往返
+            with eve_SDE.spooled_buffer(self.DOWNLOAD_SPOOL_SIZE) as buf:
+                for chunk in self.iter_download(response):
+                    buf.write(chunk)
+                buf.seek(0)
+                
+                self.progress.emit("下载完成，正在解压...")
+                # 这里通常压缩包里已经包含了 eve_sde_jsonl 文件夹，或者直接是文件
+                # 注意：如果压缩包结构不同，可能需要调整解压路径
+                # 假设压缩包根目录就是 jsonl 文件，或者包含在一个文件夹里
+                # 如果解压出来多了一层目录，需要处理，这里暂时假设覆盖解压
+                eve_SDE.extract_zip(buf, extract_path, self.extract_progress)
             
-        with zipfile.ZipFile(file_path, 'r') as zf:
-            zf.extractall(extract_path) # 这里通常压缩包里已经包含了 eve_sde_jsonl 文件夹，或者直接是文件
-            # 注意：如果压缩包结构不同，可能需要调整解压路径
-            # 假设压缩包根目录就是 jsonl 文件，或者包含在一个文件夹里
-            # 如果解压出来多了一层目录，需要处理，这里暂时假设覆盖解压
-            
-        os.remove(file_path)
+        self.progress.emit("解压完成，正在生成 _key 偏移索引...")
+        # 生成变更日志时按偏移直接读取条目，无需逐行扫描整个源文件
+        eve_SDE.build_key_index(extract_path)
+        # 与命令行共用的版本号记录，避免 CLI 读到旧的 .buildnumber 而重复下载
+        eve_SDE.write_build_number(extract_path)
         self.progress.emit("解压完成。")
 
-    def get_SDE_update(self, latest_buildNumber, latest_releaseDate):
+    def iter_download(self, response):
+        """ 按 256 KiB 分块读取响应体，减少系统调用次数，同时按 Content-Length 报告下载进度 """
+        total = int(response.headers.get("Content-Length", 0))
+        done = 0
+        for chunk in response.iter_content(chunk_size=self.DOWNLOAD_CHUNK):
+            done += len(chunk)
+            if total:
+                self.throttled_progress(f"正在下载 eve_SDE_jsonl.zip ... {done * 100 // total}% ({done >> 20}/{total >> 20} MiB)")
+            else:
+                self.throttled_progress(f"正在下载 eve_SDE_jsonl.zip ... {done >> 20} MiB")
+            yield chunk
+
+    def extract_progress(self, done, total):
+        self.throttled_progress(f"正在解压... ({done}/{total})")
+
+    def fetch_changes(self, latest_buildNumber):
+        """ 下载变更列表 (体积很小，一次性读入内存)，HTTP 错误直接抛出，不把错误页当作变更列表解析 """
         url = f"https://developers.eveonline.com/static-data/tranquility/changes/{latest_buildNumber}.jsonl"
-        self.progress.emit(f"正在下载变更日志: {url}")
-        
-        response = requests.get(url, stream=True)
+        response = self.session.get(url, timeout=self.HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    def get_SDE_update(self, latest_buildNumber, latest_releaseDate, changes=None):
+        if changes is None:
+            self.progress.emit("正在下载变更日志...")
+            changes = self.fetch_changes(latest_buildNumber)
         
         safe_release_date = latest_releaseDate.replace(":", "-")
         output_dir = os.path.join(get_base_dir(), "eve_sde_update")
@@ -212,87 +377,102 @@ class UpdateWorker(QThread):
         
         changes_file = os.path.join(output_dir, f"eve_sde_changes_{safe_release_date}.jsonl")
         
-        # 如果文件已存在，可能无需重新生成，但为了保险还是覆盖或检查
-        # 这里选择覆盖
-        with open(changes_file, "w", encoding="utf-8") as cf:
-             pass # 清空文件
-
         sde_dir = get_sde_dir()
 
-        for line in response.iter_lines():
-            if not line: continue
-            try:
-                line_data = json.loads(line)
-                key = line_data.get("_key")
+        # 如果文件已存在，可能无需重新生成，但为了保险还是覆盖或检查
+        # 这里选择覆盖；整个处理过程只打开一次文件，写入经过 1 MiB 缓冲
+        # 以二进制方式写入序列化好的 bytes，省去文本层的编码
+        with open(changes_file, "wb", buffering=self.WRITE_BUFFER) as cf:
+            # 第一遍：遍历变更清单，删除项直接写入，新增/修改项按源表汇总为 {源表: {条目ID: 状态}}
+            wanted = {}
+            files_added = set()
+            for line in changes.splitlines():
+                if not line: continue
+                try:
+                    line_data = _loads(line)
+                    key = line_data.get("_key")
                 
-                if key == '_meta':
-                    continue
+                    if key == '_meta':
+                        continue
                 
-                # 获取变更列表
-                added_ids = set(line_data.get("added", []))
-                changed_ids = set(line_data.get("changed", []))
-                removed_ids = set(line_data.get("removed", []))
-                is_file_added = line_data.get("fileAdded", False)
+                    # 获取变更列表
+                    added_ids = set(line_data.get("added", []))
+                    changed_ids = set(line_data.get("changed", []))
+                    removed_ids = set(line_data.get("removed", []))
+                    is_file_added = line_data.get("fileAdded", False)
                 
-                total_changes = len(added_ids) + len(changed_ids) + len(removed_ids)
-                if total_changes == 0 and not is_file_added: continue
+                    total_changes = len(added_ids) + len(changed_ids) + len(removed_ids)
+                    if total_changes == 0 and not is_file_added: continue
                 
-                msg = f"正在处理变更: {key} (新增:{len(added_ids)} 修改:{len(changed_ids)} 删除:{len(removed_ids)})"
-                if is_file_added:
-                    msg += " [新文件]"
-                self.progress.emit(msg)
+                    msg = f"正在处理变更: {key} (新增:{len(added_ids)} 修改:{len(changed_ids)} 删除:{len(removed_ids)})"
+                    if is_file_added:
+                        msg += " [新文件]"
+                    self.throttled_progress(msg)
                 
-                # 1. 处理删除项 (无需读取原文件，因为原文件里已经没了)
-                if removed_ids:
-                    with open(changes_file, "a", encoding="utf-8") as cf:
-                        for rid in removed_ids:
-                            record = {
-                                "_key": rid,
-                                "_source_table": key,
-                                "_status": "removed",
-                                "name": {"en": "(Item Removed)", "zh": "(条目已删除)"}
-                            }
-                            cf.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-                # 2. 处理新增和修改项 (需要读取新文件获取详情)
-                if added_ids or changed_ids or is_file_added:
-                    source_file = os.path.join(sde_dir, f"{key}.jsonl")
-                    
-                    # 特殊处理：如果是 fileAdded 导致的新增，源文件可能就是这个 key
-                    # 如果 key 本身不在 SDE_DIR 中（虽然不应该），需要下载？
-                    # 这里假设 download_latest_eve_SDE_json 已经把新文件解压好了
-                    
-                    if not os.path.exists(source_file):
-                        continue
-                        
-                    with open(source_file, "r", encoding="utf-8") as f:
-                        for f_line in f:
-                            try:
-                                data = json.loads(f_line)
-                                item_id = data.get("_key") 
-                                
-                                status = None
-                                if item_id in added_ids:
-                                    status = "added"
-                                elif item_id in changed_ids:
-                                    status = "changed"
-                                 # 兼容 fileAdded 导致的 implicit added
-                                elif is_file_added:
-                                     status = "added"
-                                
-                                if status:
-                                    # 写入变更文件
-                                    with open(changes_file, "a", encoding="utf-8") as cf:
-                                        data["_source_table"] = key
-                                        data["_status"] = status
-                                        cf.write(json.dumps(data, ensure_ascii=False) + "\n")
-                            except:
-                                continue
-            except:
-                continue
+                    # 1. 处理删除项 (无需读取原文件，因为原文件里已经没了)
+                    if removed_ids:
+                        # 整批序列化后一次 writelines 写入
+                        cf.writelines([_dumps({
+                            "_key": rid,
+                            "_source_table": key,
+                            "_status": "removed",
+                            "name": {"en": "(Item Removed)", "zh": "(条目已删除)"}
+                        }) + b"\n" for rid in removed_ids])
+
+                    # 2. 新增和修改项先汇总，同一源表出现多次也只读取一遍
+                    if added_ids or changed_ids or is_file_added:
+                        status_map = wanted.setdefault(key, {})
+                        status_map.update(dict.fromkeys(changed_ids, "changed"))
+                        status_map.update(dict.fromkeys(added_ids, "added"))
+                        if is_file_added:
+                            files_added.add(key)
+                except (ValueError, KeyError):
+                    continue # 只跳过无法解析的行，其他异常 (如写入失败) 向上传播
+
+            # 第二遍：各源表互不依赖，多线程并行读取 (文件 IO 与 orjson 解析时释放 GIL)，
+            # 按变更清单中的顺序依次写入变更文件
+            total = len(wanted)
+            with ThreadPoolExecutor(max_workers=self.SCAN_WORKERS) as executor:
+                results = executor.map(
+                    lambda item: self.collect_table_changes(sde_dir, item[0], item[1], item[0] in files_added),
+                    wanted.items())
+                for done, (key, lines) in enumerate(zip(wanted, results), 1):
+                    self.throttled_progress(f"正在读取变更条目: {key} ({done}/{total})")
+                    # 每个源表的记录一次 writelines 写入变更文件
+                    cf.writelines(lines)
                 
         self.progress.emit(f"变更日志已保存: {changes_file}")
 
+    def collect_table_changes(self, sde_dir, key, status_map, file_added):
+        """ 从单个源表中取出新增/修改的条目，返回序列化后的变更行 (bytes) 列表 (在工作线程中执行) """
+        source_file = os.path.join(sde_dir, f"{key}.jsonl")
+        
+        # 特殊处理：如果是 fileAdded 导致的新增，源文件可能就是这个 key
+        # 这里假设 download_latest_eve_SDE_json 已经把新文件解压好了
+        if not os.path.exists(source_file):
+            return []
+            
+        if file_added:
+            # 新文件需要逐行读取，其中的全部条目都视为新增 (status 稍后确定)
+            records = ((f_line, None) for f_line in iter_lines(source_file))
+        else:
+            # 按 _key 偏移索引直接定位需要的条目 (无索引时退回正则扫描)
+            records = eve_SDE.iter_wanted_records(source_file, status_map)
+        
+        lines = []
+        for f_line, status in records:
+            try:
+                data = _loads(f_line)
+                if status is None:
+                    # 兼容 fileAdded 导致的 implicit added
+                    status = status_map.get(data.get("_key"), "added")
+                data["_source_table"] = key
+                data["_status"] = status
+                lines.append(_dumps(data) + b"\n")
+            except (ValueError, KeyError):
+                continue
+        return lines
+
 
 import difflib
 
@@ -300,14 +480,51 @@ class DetailWindow(QWidget):
     """
     详情展示窗口 (增强版)
     """
+    LAZY_ROLE = Qt.UserRole + 1 # 尚未展开的子数据在 lazy_values 中的编号
+
+    # 颜色定义 (预先构造 QBrush，setForeground 不必每次从颜色枚举转换)
+    COLOR_STRING = QBrush(QColor(Qt.GlobalColor.darkGreen))
+    COLOR_NUMBER = QBrush(QColor(Qt.GlobalColor.blue))
+    COLOR_BOOL = QBrush(QColor(Qt.GlobalColor.darkMagenta))
+    COLOR_NULL = QBrush(QColor(Qt.GlobalColor.gray))
+    COLOR_KEY = QBrush(QColor(Qt.GlobalColor.black))
+    COLOR_INDEX = QBrush(QColor(Qt.GlobalColor.darkGray))
+    COLOR_ID_LINK = QBrush(QColor(Qt.GlobalColor.darkCyan)) # 关联ID的颜色
+
+    # 样式字体，所有节点共用 (QFont 需要在 QApplication 创建后构造，首次打开窗口时初始化)
+    FONT_KEY = None
+    FONT_VALUE = None
+    FONT_ID_LINK = None
+    FONT_TITLE = None
+    FONT_SUBTITLE = None
+    FONT_ID = None
+    FONT_LABEL = None
+
+    @classmethod
+    def init_fonts(cls):
+        if cls.FONT_KEY is not None:
+            return
+        cls.FONT_KEY = QFont("Segoe UI", 10)
+        cls.FONT_KEY.setBold(True)
+        cls.FONT_VALUE = QFont("Consolas", 10) # 等宽字体适合显示数值和代码
+        # 关联ID加粗提示比较特殊
+        cls.FONT_ID_LINK = QFont(cls.FONT_VALUE)
+        cls.FONT_ID_LINK.setBold(True)
+        # 标题头和差异页的字体，每个详情窗口共用
+        cls.FONT_TITLE = QFont("Microsoft YaHei", 16, QFont.Bold)
+        cls.FONT_SUBTITLE = QFont("Microsoft YaHei", 12)
+        cls.FONT_ID = QFont("Consolas", 12, QFont.Bold)
+        cls.FONT_LABEL = QFont("Microsoft YaHei", 10, QFont.Bold)
+    
     def __init__(self, json_str, parent=None):
         super().__init__(parent, Qt.Window)
+        self.init_fonts()
         self.setWindowTitle("条目详细信息")
         self.resize(1000, 800)
         
-        # 解析数据
+        # 解析数据 (json_str 可以是 str 或 UTF-8 bytes)
         try:
-            self.full_data = json.loads(json_str)
+            self.full_data = _loads(json_str)
         except:
             self.full_data = {}
             
@@ -343,18 +560,18 @@ class DetailWindow(QWidget):
         item_id = self.display_data.get("_key") or self.display_data.get("id") or self.display_data.get("typeID") or "N/A"
         
         name_label = QLabel(f"{name_zh}")
-        name_label.setFont(QFont("Microsoft YaHei", 16, QFont.Bold))
+        name_label.setFont(self.FONT_TITLE)
         title_line.addWidget(name_label)
         
         if name_en and name_en != name_zh:
             en_label = QLabel(f"({name_en})")
-            en_label.setFont(QFont("Microsoft YaHei", 12))
+            en_label.setFont(self.FONT_SUBTITLE)
             title_line.addWidget(en_label)
             
         title_line.addStretch()
         
         id_label = QLabel(f"ID: {item_id}")
-        id_label.setFont(QFont("Consolas", 12, QFont.Bold))
+        id_label.setFont(self.FONT_ID)
         id_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
         title_line.addWidget(id_label)
         
@@ -439,8 +656,12 @@ class DetailWindow(QWidget):
         
         tree_tab_layout.addWidget(self.tree)
         
-        self.populate_tree(self.tree.invisibleRootItem(), self.display_data)
-        self.tree.expandToDepth(0)
+        # 只构建默认可见的两层，更深的节点在展开时再创建
+        # 子数据留在 Python 字典中，避免整棵子树转换成 QVariant
+        self.lazy_values = {}
+        self.tree.itemExpanded.connect(self.load_lazy_children)
+        # 属性树 (以及 ID 名称查询) 推迟到窗口第一次显示之后再构建，先让窗口和基本信息显示出来
+        self.tree_built = False
         
         self.tabs.addTab(self.tree_tab, "所有属性 (Properties)")
         
@@ -450,16 +671,18 @@ class DetailWindow(QWidget):
             diff_layout = QVBoxLayout(self.diff_widget)
             
             diff_label = QLabel("版本差异对比 (Old vs New):")
-            diff_label.setFont(QFont("Microsoft YaHei", 10, QFont.Bold))
+            diff_label.setFont(self.FONT_LABEL)
             diff_layout.addWidget(diff_label)
             
             self.diff_text = QTextEdit()
             self.diff_text.setReadOnly(True)
-            self.diff_text.setFont(QFont("Consolas", 10))
+            self.diff_text.setFont(self.FONT_VALUE)
             diff_layout.addWidget(self.diff_text)
             
             self.tabs.addTab(self.diff_widget, "差异对比 (Diff)")
-            self.show_diff()
+            # 差异在第一次切换到该标签页时才计算，只看属性时不必付出 diff 的开销
+            self.diff_loaded = False
+            self.tabs.currentChanged.connect(self.on_tab_changed)
             
         bottom_layout.addWidget(self.tabs)
         splitter.addWidget(bottom_widget)
@@ -470,7 +693,7 @@ class DetailWindow(QWidget):
         btn_layout = QHBoxLayout()
         
         expand_btn = QPushButton("展开所有")
-        expand_btn.clicked.connect(self.tree.expandAll)
+        expand_btn.clicked.connect(self.expand_all)
         collapse_btn = QPushButton("折叠所有")
         collapse_btn.clicked.connect(self.tree.collapseAll)
         
@@ -487,6 +710,28 @@ class DetailWindow(QWidget):
         btn_layout.addWidget(close_btn)
         main_layout.addLayout(btn_layout)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.tree_built:
+            self.tree_built = True
+            QTimer.singleShot(0, self.build_tree)
+
+    def build_tree(self):
+        """ 构建属性树的前两层 """
+        # 一次性批量查出所有 ID 字段的名称，建树时直接命中缓存
+        try:
+            prefetch_id_names(self.collect_id_values(self.display_data, []))
+        except sqlite3.Error:
+            pass
+        # 填充期间关闭重绘、信号和排序，避免每个 addChildren 都触发重新布局
+        self.tree.setUpdatesEnabled(False)
+        self.tree.blockSignals(True)
+        self.tree.setSortingEnabled(False)
+        self.populate_tree(self.tree.invisibleRootItem(), self.display_data, depth=1)
+        self.tree.expandToDepth(0)
+        self.tree.blockSignals(False)
+        self.tree.setUpdatesEnabled(True)
+
     def get_value(self, data, path):
         """ 安全获取嵌套字典的值 (path: 'a.b.c') """
         keys = path.split('.')
@@ -498,45 +743,58 @@ class DetailWindow(QWidget):
                 return None
         return curr
 
-    def filter_tree(self, text):
-        """ 过滤树节点 """
-        text = text.lower()
-        
-        def traverse(item):
-            found = False
-            # 检查当前节点
-            if text in item.text(0).lower() or text in item.text(1).lower():
-                found = True
-            
-            # 检查子节点
+    def load_lazy_children(self, item):
+        """ 节点展开时创建其子节点 (替换占位项) """
+        token = item.data(0, self.LAZY_ROLE)
+        if token is None:
+            return
+        value = self.lazy_values.pop(token)
+        # 展开大数组时同样先关闭重绘 (展开全部时外层已关闭，这里保持原状态)
+        updates = self.tree.updatesEnabled()
+        self.tree.setUpdatesEnabled(False)
+        item.setData(0, self.LAZY_ROLE, None)
+        item.takeChildren()
+        self.populate_tree(item, value, depth=0)
+        self.tree.setUpdatesEnabled(updates)
+
+    def load_all(self):
+        """ 创建所有尚未加载的节点 (展开全部/过滤前调用) """
+        stack = [self.tree.invisibleRootItem()]
+        while stack:
+            item = stack.pop()
+            self.load_lazy_children(item)
             for i in range(item.childCount()):
-                child = item.child(i)
-                if traverse(child):
-                    found = True
-            
-            item.setHidden(not found)
-            if found:
-                item.setExpanded(True) # 展开匹配项
-            return found
-
-        root = self.tree.invisibleRootItem()
-        for i in range(root.childCount()):
-            traverse(root.child(i))
+                stack.append(item.child(i))
+
+    def expand_all(self):
+        # expandAll 不会触发 itemExpanded，需要先把懒加载的节点全部创建出来
+        self.tree.setUpdatesEnabled(False)
+        self.load_all()
+        self.tree.expandAll()
+        self.tree.setUpdatesEnabled(True)
+
+    def on_tab_changed(self, index):
+        if not self.diff_loaded and self.tabs.widget(index) is self.diff_widget:
+            self.diff_loaded = True
+            self.show_diff()
 
     def show_diff(self):
-        old_json = json.dumps(self.full_data.get("old", {}), indent=2, ensure_ascii=False, sort_keys=True)
-        new_json = json.dumps(self.full_data.get("new", {}), indent=2, ensure_ascii=False, sort_keys=True)
+        old_json = _dumps_pretty(self.full_data.get("old", {}))
+        new_json = _dumps_pretty(self.full_data.get("new", {}))
         
-        diff = difflib.ndiff(old_json.splitlines(), new_json.splitlines())
+        # unified_diff 只做行级比较 (ndiff 还会逐字符比对相似行，大条目上很慢)
+        diff = difflib.unified_diff(old_json.splitlines(), new_json.splitlines(), "old", "new", n=3, lineterm="")
         
         html = []
         for line in diff:
-            if line.startswith("+ "):
+            if line.startswith(("+++", "---")):
+                html.append(f'<span style="color: #6a737d; font-weight: bold;">{line}</span>')
+            elif line.startswith("+"):
                 html.append(f'<span style="background-color: #e6ffec; color: #24292e;">{line}</span>')
-            elif line.startswith("- "):
+            elif line.startswith("-"):
                 html.append(f'<span style="background-color: #ffebe9; color: #24292e;">{line}</span>')
-            elif line.startswith("? "):
-                continue
+            elif line.startswith("@@"):
+                html.append(f'<span style="color: #0366d6;">{line}</span>')
             else:
                 html.append(f'<span style="color: #6a737d;">{line}</span>')
         
@@ -544,64 +802,60 @@ class DetailWindow(QWidget):
 
     def get_id_name(self, item_id):
         """
-        尝试从数据库查询 ID 对应的名称
+        尝试从数据库查询 ID 对应的名称 (结果缓存，未命中时单独查询)
         """
         if not item_id or str(item_id) == "0":
             return None
-            
-        try:
-            db_path = os.path.join(get_base_dir(), "data", "eve_sde.db")
-            if not os.path.exists(db_path):
+        key = str(item_id)
+        if key not in _ID_CACHE:
+            try:
+                prefetch_id_names([key])
+            except sqlite3.Error:
                 return None
-                
-            # 这里为了简单直接用 sqlite3，避免频繁开关连接
-            # 实际生产中最好复用连接池，但这里只是偶尔查询，影响不大
-            import sqlite3
-            conn = sqlite3.connect(db_path, timeout=5)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name_zh, name_en FROM items WHERE id = ?", (str(item_id),))
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                zh, en = row
-                if zh: return zh
-                if en: return en
-                
-            return None
-        except:
-            return None
+        return _ID_CACHE.get(key)
 
-    def populate_tree(self, parent_item, data):
+    def collect_id_values(self, data, out):
+        """ 收集数据中所有 *id 字段的值，用于批量预取名称 """
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if isinstance(value, (dict, list)):
+                    self.collect_id_values(value, out)
+                elif isinstance(value, (int, str)) and str(key).lower().endswith("id"):
+                    out.append(value)
+        elif isinstance(data, list):
+            for value in data:
+                if isinstance(value, (dict, list)):
+                    self.collect_id_values(value, out)
+        return out
+
+    def populate_tree(self, parent_item, data, depth=0):
         """
         递归填充树形节点 (带样式 + ID解析)
+        depth: 继续向下构建的层数，超出部分的非空容器只放一个占位子节点，展开时再加载
         """
-        # 定义样式字体
-        font_key = QFont("Segoe UI", 10)
-        font_key.setBold(True)
-        
-        font_value = QFont("Consolas", 10) # 等宽字体适合显示数值和代码
-        
-        # 颜色定义
-        COLOR_STRING = Qt.GlobalColor.darkGreen
-        COLOR_NUMBER = Qt.GlobalColor.blue
-        COLOR_BOOL = Qt.GlobalColor.darkMagenta
-        COLOR_NULL = Qt.GlobalColor.gray
-        COLOR_KEY = Qt.GlobalColor.black
-        COLOR_ID_LINK = Qt.GlobalColor.darkCyan # 关联ID的颜色
-
+        # 样式取自类属性，节点之间共用同一组字体对象
+        font_key = self.FONT_KEY
+        font_value = self.FONT_VALUE
+        COLOR_STRING = self.COLOR_STRING
+        COLOR_NUMBER = self.COLOR_NUMBER
+        COLOR_BOOL = self.COLOR_BOOL
+        COLOR_NULL = self.COLOR_NULL
+
+        # 子节点先脱离树构建，最后一次性 addChildren，避免逐项通知模型
+        children = []
         if isinstance(data, dict):
             for key in sorted(data.keys()):
                 value = data[key]
-                item = QTreeWidgetItem(parent_item)
+                item = QTreeWidgetItem()
+                children.append(item)
                 
                 # 设置 Key 样式
                 item.setText(0, str(key))
                 item.setFont(0, font_key)
-                item.setForeground(0, COLOR_KEY)
+                item.setForeground(0, self.COLOR_KEY)
                 
                 if isinstance(value, (dict, list)):
-                    self.populate_tree(item, value)
+                    self.populate_tree_child(item, value, depth)
                     if not value:
                          item.setText(1, "[]" if isinstance(value, list) else "{}")
                          item.setForeground(1, COLOR_NULL)
@@ -623,11 +877,8 @@ class DetailWindow(QWidget):
                     
                     # 设置 Value 颜色
                     if is_id_field:
-                        item.setForeground(1, COLOR_ID_LINK)
-                        # 可以加粗或者下划线提示比较特殊
-                        f = QFont(font_value)
-                        f.setBold(True)
-                        item.setFont(1, f)
+                        item.setForeground(1, self.COLOR_ID_LINK)
+                        item.setFont(1, self.FONT_ID_LINK)
                     elif isinstance(value, str):
                         item.setForeground(1, COLOR_STRING)
                     elif isinstance(value, (int, float)):
@@ -640,22 +891,24 @@ class DetailWindow(QWidget):
                     
         elif isinstance(data, list):
             for index, value in enumerate(data):
-                item = QTreeWidgetItem(parent_item)
+                item = QTreeWidgetItem()
+                children.append(item)
                 
                 # 数组索引样式
                 item.setText(0, f"[{index}]")
                 item.setFont(0, font_key)
-                item.setForeground(0, Qt.GlobalColor.darkGray)
+                item.setForeground(0, self.COLOR_INDEX)
                 
                 if isinstance(value, (dict, list)):
-                    self.populate_tree(item, value)
+                    self.populate_tree_child(item, value, depth)
                     if not value:
                          item.setText(1, "[]" if isinstance(value, list) else "{}")
                          item.setForeground(1, COLOR_NULL)
                 else:
-                    item.setText(1, str(value))
+                    text = str(value)
+                    item.setText(1, text)
                     item.setFont(1, font_value)
-                    item.setToolTip(1, str(value))
+                    item.setToolTip(1, text)
                     
                     if isinstance(value, str):
                         item.setForeground(1, COLOR_STRING)
@@ -667,7 +920,25 @@ class DetailWindow(QWidget):
                         item.setText(1, "null")
                         item.setForeground(1, COLOR_NULL)
 
+        parent_item.addChildren(children)
+
+    def populate_tree_child(self, item, value, depth):
+        """ 填充容器节点：层数未用完时直接递归，否则挂占位项延迟到展开时 """
+        if not value:
+            return
+        if depth > 0:
+            self.populate_tree(item, value, depth - 1)
+        else:
+            token = id(value) # value 保存在 lazy_values 中，存活期间 id 唯一
+            self.lazy_values[token] = value
+            item.setData(0, self.LAZY_ROLE, token)
+            placeholder = QTreeWidgetItem(item)
+            placeholder.setText(0, f"... ({len(value)} 项)")
+            placeholder.setForeground(0, self.COLOR_NULL)
+
     def copy_raw(self, text):
+        if isinstance(text, (bytes, bytearray)):
+            text = text.decode("utf-8") # 只在复制时才解码
         QApplication.clipboard().setText(text)
         QMessageBox.information(self, "提示", "原始 JSON 已复制到剪贴板！")
 
@@ -739,8 +1010,6 @@ class UpdateHistoryWindow(QWidget):
         refresh_btn = QPushButton("刷新列表")
         refresh_btn.clicked.connect(self.refresh_logs)
         layout.addWidget(refresh_btn)
-        
-        self.detail_windows = []
 
     def refresh_logs(self):
         self.list_widget.clear()
@@ -749,12 +1018,12 @@ class UpdateHistoryWindow(QWidget):
             self.list_widget.addItem("暂无更新记录")
             return
             
-        files = [f for f in os.listdir(update_dir) if f.endswith(".jsonl")]
+        with os.scandir(update_dir) as it:
+            files = [e.name for e in it if e.name.endswith(".jsonl") and e.is_file()]
         # 按时间倒序
         files.sort(reverse=True)
         
-        for f in files:
-            self.list_widget.addItem(f)
+        self.list_widget.addItems(files)
 
     def open_log(self, item):
         file_name = item.text()
@@ -767,8 +1036,129 @@ class UpdateHistoryWindow(QWidget):
         # 由于可能很多，我们可以用一个列表展示
         viewer = ChangeLogViewer(file_path)
         viewer.show()
-        self.detail_windows.append(viewer)
-        self.detail_windows = [w for w in self.detail_windows if w.isVisible()]
+        keep_window(viewer)
+
+class ChangeLogLoader(QThread):
+    """
+    后台变更日志解析线程
+    """
+    batch_ready = pyqtSignal(list) # 一批记录 [(状态, 来源表, ID, 名称, (行偏移, 行长度)), ...]
+    error = pyqtSignal(str) # 错误信息
+    progress = pyqtSignal(int) # 读取进度百分比 (按已读取的字节数计算)
+
+    BATCH_SIZE = 256
+
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
+        self.is_running = True
+
+    def run(self):
+        # simdjson 的解析器复用内部缓冲区，由本线程独占
+        self.parser = simdjson.Parser() if simdjson is not None else None
+        try:
+            batch = []
+            total = os.path.getsize(self.file_path) or 1
+            done = 0
+            for raw_line in iter_lines(self.file_path):
+                if not self.is_running:
+                    return
+                offset = done
+                done += len(raw_line) + 1 # 加上被切掉的换行符
+                # 空行和非对象行 (如文件末尾的空行、被截断的行) 在字节层面直接跳过，不进入 JSON 解析和异常处理
+                if not raw_line.lstrip().startswith(b"{"):
+                    continue
+                try:
+                    # 只记录行在文件中的位置，打开详情时再读取原始 JSON，内存占用不随日志大小增长
+                    batch.append(self.read_record(raw_line) + ((offset, len(raw_line)),))
+                except (ValueError, AttributeError):
+                    # 无法解析的行 (JSON 错误、编码错误，或顶层不是对象) 跳过，其他异常交给外层报告
+                    continue
+                
+                if len(batch) >= self.BATCH_SIZE:
+                    self.batch_ready.emit(batch)
+                    batch = []
+                    self.progress.emit(min(100, done * 100 // total))
+            if batch:
+                self.batch_ready.emit(batch)
+            self.progress.emit(100)
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def read_record(self, raw_line):
+        """
+        解析一行变更记录，返回 (状态, 来源表, ID, 名称)
+        simdjson 的解析器在上一条记录的对象仍被引用时不能复用，因此放在单独的方法里，返回时局部引用随之释放
+        """
+        data = self.parser.parse(raw_line) if self.parser is not None else _loads(raw_line)
+        source = data.get("_source_table", "Unknown")
+        item_id = str(data.get("_key") or data.get("id") or "N/A")
+        status = data.get("_status", "changed") # 默认为 changed (兼容旧日志)
+        
+        name = ""
+        name_data = data.get("name")
+        if simdjson is not None and isinstance(name_data, simdjson.Object):
+            name_data = name_data.as_dict() # name 很小，直接转换为 dict
+        if isinstance(name_data, dict):
+            name = name_data.get("zh") or name_data.get("en") or str(name_data)
+        elif isinstance(name_data, str):
+            name = name_data
+        return status, source, item_id, name
+
+    def stop(self):
+        self.is_running = False
+
+class ChangeLogModel(QAbstractTableModel):
+    """
+    变更日志表格模型
+    数据为 (状态, 来源表, ID, 名称, (行偏移, 行长度)) 元组列表，单元格按需取值，不再逐格创建 QTableWidgetItem
+    """
+    HEADERS = ["状态", "来源表", "ID", "名称 (若有)", "查看"]
+    STATUS_TEXT = {"added": "新增", "removed": "删除", "changed": "修改"}
+    # ForegroundRole 直接返回 QBrush，视图绘制时无需再把颜色转换为画刷
+    STATUS_BRUSHES = {
+        "added": QBrush(QColor(Qt.GlobalColor.darkGreen)),
+        "removed": QBrush(QColor(Qt.GlobalColor.red)),
+        "changed": QBrush(QColor(Qt.GlobalColor.blue)),
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return self.STATUS_TEXT.get(row[0], row[0])
+            if column == 4:
+                return "双击查看"
+            return row[column]
+        if role == Qt.ForegroundRole and column == 0:
+            return self.STATUS_BRUSHES.get(row[0])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def append_batch(self, items):
+        if not items:
+            return
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(items) - 1)
+        self.rows.extend(items)
+        self.endInsertRows()
 
 class ChangeLogViewer(QWidget):
     """
@@ -781,83 +1171,132 @@ class ChangeLogViewer(QWidget):
         
         layout = QVBoxLayout(self)
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["状态", "来源表", "ID", "名称 (若有)", "查看"])
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        self.model = ChangeLogModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        # 前三列不用 ResizeToContents (每追加一批都要重新测量所有行)，收到第一批数据时按内容调整一次
         self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        # 行高固定，滚动和追加行时无需逐行计算高度
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.setVerticalScrollMode(QTableView.ScrollPerPixel)
         self.table.setAlternatingRowColors(True)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.itemDoubleClicked.connect(self.show_detail)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.doubleClicked.connect(self.show_detail)
         
         layout.addWidget(self.table)
         
+        # 加载进度 (读取完成后隐藏)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        layout.addWidget(self.progress_bar)
+        
+        self.file_path = file_path
         self.load_data(file_path)
-        self.detail_windows = []
 
     def load_data(self, file_path):
+        # 在后台线程中解析日志，分批填入表格，避免大文件卡住界面
+        self.loader = ChangeLogLoader(file_path)
+        self.loader.batch_ready.connect(self.add_rows)
+        self.loader.error.connect(lambda msg: QMessageBox.warning(self, "错误", f"无法读取文件: {msg}"))
+        self.loader.progress.connect(self.progress_bar.setValue)
+        self.loader.finished.connect(self.progress_bar.hide)
+        self.loader.start()
+
+    def add_rows(self, batch):
+        # 整批追加到模型，视图只需处理一次行插入通知
+        first = self.model.rowCount() == 0
+        self.model.append_batch(batch)
+        if first:
+            for column in range(3):
+                self.table.resizeColumnToContents(column)
+
+    def closeEvent(self, event):
+        if self.loader.isRunning():
+            self.loader.stop()
+            self.loader.wait()
+        super().closeEvent(event)
+
+    def show_detail(self, index):
+        # 模型中只有行的位置，按偏移从日志文件中读出这一行
+        offset, length = self.model.rows[index.row()][4]
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                row = 0
-                for line in f:
-                    try:
-                        data = json.loads(line)
-                        source = data.get("_source_table", "Unknown")
-                        item_id = str(data.get("_key") or data.get("id") or "N/A")
-                        status = data.get("_status", "changed") # 默认为 changed (兼容旧日志)
-                        
-                        name = ""
-                        name_data = data.get("name")
-                        if isinstance(name_data, dict):
-                            name = name_data.get("zh") or name_data.get("en") or str(name_data)
-                        elif isinstance(name_data, str):
-                            name = name_data
-                            
-                        self.table.insertRow(row)
-                        
-                        # status item with color
-                        status_item = QTableWidgetItem(self.translate_status(status))
-                        if status == "added":
-                            status_item.setForeground(Qt.GlobalColor.darkGreen)
-                        elif status == "removed":
-                            status_item.setForeground(Qt.GlobalColor.red)
-                        elif status == "changed":
-                            status_item.setForeground(Qt.GlobalColor.blue)
-                        
-                        self.table.setItem(row, 0, status_item)
-                        self.table.setItem(row, 1, QTableWidgetItem(source))
-                        self.table.setItem(row, 2, QTableWidgetItem(item_id))
-                        self.table.setItem(row, 3, QTableWidgetItem(name))
-                        self.table.setItem(row, 4, QTableWidgetItem("双击查看"))
-                        
-                        # 存储完整 JSON
-                        self.table.item(row, 0).setData(Qt.UserRole, line)
-                        
-                        row += 1
-                    except:
-                        continue
-        except Exception as e:
+            with open(self.file_path, "rb") as f:
+                f.seek(offset)
+                raw_line = f.read(length)
+        except OSError as e:
             QMessageBox.warning(self, "错误", f"无法读取文件: {e}")
+            return
+        if raw_line:
+            detail_win = DetailWindow(raw_line) # 直接传 bytes，_loads 可解析 bytes，无需先解码
+            detail_win.show()
+            keep_window(detail_win)
 
-    def translate_status(self, status):
-        if status == "added": return "新增"
-        if status == "removed": return "删除"
-        if status == "changed": return "修改"
-        return status
+class ResultsModel(QAbstractTableModel):
+    """
+    搜索结果表格模型
+    数据为 (文件名, ID, 中文名, 英文名, rowid) 元组列表，单元格按需取值，不再逐格创建 QTableWidgetItem
+    结果先全部存入 rows，视图只看到前 loaded 行，滚动到底部时再通过 fetchMore 逐段展开
+    """
+    HEADERS = ["源文件", "ID", "中文名称", "英文名称"]
+    FETCH_SIZE = 256 # 每次向视图展开的行数
 
-    def show_detail(self, item):
-        row = item.row()
-        json_str = self.table.item(row, 0).data(Qt.UserRole)
-        if json_str:
-            detail_win = DetailWindow(json_str)
-            detail_win.show()
-            self.detail_windows.append(detail_win)
-            self.detail_windows = [w for w in self.detail_windows if w.isVisible()]
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.loaded = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return row[index.column()]
+        if role == Qt.UserRole:
+            return row[4] # 数据库 rowid，用于读取完整 JSON
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.FETCH_SIZE, len(self.rows) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def append_batch(self, items):
+        if not items:
+            return
+        self.rows.extend(items)
+        # 第一屏直接展开，其余行等视图滚动到底部时再取
+        if self.loaded < self.FETCH_SIZE:
+            self.fetchMore()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.loaded = 0
+        self.endResetModel()
 
 class EveSearchApp(QMainWindow):
+    SEARCH_CACHE_SIZE = 32
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("EVE SDE 数据库搜索工具")
@@ -870,22 +1309,29 @@ class EveSearchApp(QMainWindow):
             
         self.setup_ui()
         self.worker = None
+        # 查询结果缓存：关键词集合 -> rowid 列表 (只缓存未被截断的完整结果)
+        self.db = eve_db.EveDB(DB_PATH, read_only=True) # 搜索和详情共用的只读查询连接
+        self.search_cache = OrderedDict()
+        self.search_key = None
         self.update_worker = None
         self.index_worker = None
-        self.detail_windows = [] # 防止窗口被垃圾回收
         self.history_window = None
         
         # 启动时检查索引
-        QThread.msleep(100) # Give UI a moment
-        self.check_index_on_startup()
+        # 窗口显示后再检查索引 (事件循环空闲时执行)，不阻塞主窗口的首次绘制
+        QTimer.singleShot(0, self.check_index_on_startup)
 
     def check_index_on_startup(self):
-        db_path = os.path.join(get_base_dir(), "data", "eve_sde.db")
-        if not os.path.exists(db_path):
+        if not os.path.exists(DB_PATH):
             reply = QMessageBox.question(self, "索引缺失", "未检测到搜索索引数据库，是否立即构建？\n(构建索引可以显著加快搜索速度)",
                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
             if reply == QMessageBox.Yes:
                 self.start_index_build()
+        elif self.db.needs_rebuild():
+            reply = QMessageBox.question(self, "索引需要更新", "索引数据库的格式已过期，需要重新构建后才能搜索，是否立即构建？",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            if reply == QMessageBox.Yes:
+                self.start_index_build()
 
     def start_index_build(self):
         if self.index_worker and self.index_worker.isRunning():
@@ -895,6 +1341,8 @@ class EveSearchApp(QMainWindow):
         self.search_btn.setEnabled(False)
         self.progress_bar.show()
         
+        self.db.close() # 重建会改变来源文件表和 FTS 状态，查询连接在下次搜索时重新打开并重新读取
+        reset_id_names() # 重建后 ID 对应的名称可能变化
         self.index_worker = IndexWorker()
         self.index_worker.progress.connect(self.index_progress)
         self.index_worker.finished.connect(self.index_finished)
@@ -905,6 +1353,7 @@ class EveSearchApp(QMainWindow):
         self.progress_bar.setValue(percent)
         
     def index_finished(self, success, msg):
+        self.search_cache.clear() # 重建索引后 rowid 会变化
         self.rebuild_btn.setEnabled(True)
         self.search_btn.setEnabled(True)
         self.progress_bar.hide()
@@ -950,12 +1399,13 @@ class EveSearchApp(QMainWindow):
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("请输入关键词 (例如: 乌鸦级, Tritanium, 34 ...)")
-        self.search_input.setFont(QFont("Microsoft YaHei", 12))
+        font_input = QFont("Microsoft YaHei", 12) # 输入框和按钮共用
+        self.search_input.setFont(font_input)
         self.search_input.setMinimumHeight(40)
         self.search_input.returnPressed.connect(self.start_search) # 回车搜索
         
         self.search_btn = QPushButton("搜索")
-        self.search_btn.setFont(QFont("Microsoft YaHei", 12))
+        self.search_btn.setFont(font_input)
         self.search_btn.setMinimumHeight(40)
         self.search_btn.setMinimumWidth(100)
         self.search_btn.clicked.connect(self.start_search)
@@ -965,24 +1415,31 @@ class EveSearchApp(QMainWindow):
         layout.addLayout(search_layout)
 
         # 3. 结果表格
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["源文件", "ID", "中文名称", "英文名称"])
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents) 
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        self.model = ResultsModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        # 前两列不用 ResizeToContents (每插入一批行都要重新测量全部行)，收到每次搜索的第一批结果时按内容调整一次
         self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)          
         self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)          
         self.table.setAlternatingRowColors(True) 
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows) 
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers) # 禁止编辑
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows) 
+        self.table.setEditTriggers(QTableView.NoEditTriggers) # 禁止编辑
         self.table.setFont(QFont("Microsoft YaHei", 10))
         
         # 启用右键菜单
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
+        # 右键菜单只创建一次，弹出时只更新动作文字和对应的行
+        self.context_row = None
+        self.context_menu = QMenu(self.table)
+        self.copy_id_action = self.context_menu.addAction("", self.copy_context_id)
+        self.copy_zh_action = self.context_menu.addAction("", self.copy_context_zh)
+        self.copy_en_action = self.context_menu.addAction("", self.copy_context_en)
+        self.context_menu.addSeparator()
+        self.context_menu.addAction("查看详细信息", self.show_context_detail)
         
         # 绑定双击事件
-        self.table.itemDoubleClicked.connect(self.show_detail)
+        self.table.doubleClicked.connect(self.show_detail)
 
         layout.addWidget(self.table)
 
@@ -1009,7 +1466,7 @@ class EveSearchApp(QMainWindow):
             self.worker.stop()
             self.worker.wait()
 
-        self.table.setRowCount(0)
+        self.model.clear()
         self.status_label.setText(f"正在全库搜索: '{keyword}' ...")
         self.search_btn.setText("停止")
         self.search_btn.clicked.disconnect()
@@ -1018,8 +1475,19 @@ class EveSearchApp(QMainWindow):
         self.progress_bar.setRange(0, 0) # 忙碌状态
         self.progress_bar.show()
 
-        self.worker = SearchWorker(keyword)
-        self.worker.result_found.connect(self.add_result)
+        # 新查询包含某个已缓存查询的全部关键词时，结果必然是缓存结果的子集，只需在其中查找
+        self.search_key = frozenset(keyword.lower().split())
+        candidates = None
+        best = None
+        for key in self.search_cache:
+            if key <= self.search_key and (best is None or len(key) > len(best)):
+                best = key
+        if best is not None:
+            self.search_cache.move_to_end(best)
+            candidates = self.search_cache[best]
+
+        self.worker = SearchWorker(self.db, keyword, candidates)
+        self.worker.results_batch.connect(self.add_results)
         self.worker.finished.connect(self.search_finished)
         self.worker.error.connect(self.search_error)
         self.worker.start()
@@ -1028,21 +1496,24 @@ class EveSearchApp(QMainWindow):
         if self.worker and self.worker.isRunning():
             self.worker.stop()
             self.status_label.setText("搜索已手动停止")
-            self.search_finished(self.table.rowCount())
+            self.search_finished(len(self.model.rows))
 
-    def add_result(self, file_name, item_id, name_zh, name_en, json_str):
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-        
-        self.table.setItem(row, 0, QTableWidgetItem(file_name))
-        self.table.setItem(row, 1, QTableWidgetItem(item_id))
-        self.table.setItem(row, 2, QTableWidgetItem(name_zh))
-        self.table.setItem(row, 3, QTableWidgetItem(name_en))
-        
-        # 将完整 JSON 存储在第一个单元格的 UserRole 数据中，方便后续获取
-        self.table.item(row, 0).setData(Qt.UserRole, json_str)
+    def add_results(self, batch):
+        # 整批追加到模型，视图只需处理一次行插入通知
+        first = not self.model.rows
+        self.model.append_batch(batch)
+        if first:
+            for column in range(2):
+                self.table.resizeColumnToContents(column)
 
     def search_finished(self, total_count):
+        # 正常结束且未达到上限时结果是完整的，可用于后续更长查询的候选集
+        worker = self.sender()
+        if worker is self.worker and worker.is_running and total_count < SearchWorker.LIMIT:
+            self.search_cache[self.search_key] = [row[4] for row in self.model.rows]
+            self.search_cache.move_to_end(self.search_key)
+            while len(self.search_cache) > self.SEARCH_CACHE_SIZE:
+                self.search_cache.popitem(last=False)
         self.status_label.setText(f"搜索完成，共找到 {total_count} 个结果。")
         self.reset_ui_state()
 
@@ -1063,60 +1534,51 @@ class EveSearchApp(QMainWindow):
         self.search_input.setFocus()
 
     def show_context_menu(self, position):
-        # 获取选中的行
-        indexes = self.table.selectedIndexes()
-        if not indexes:
+        # 直接取鼠标所在的行 (selectedIndexes 会为选中的每个单元格构造一个索引)
+        index = self.table.indexAt(position)
+        if not index.isValid():
             return
             
-        row = indexes[0].row()
+        self.context_row = index.row()
         
         # 获取数据
-        file_name = self.table.item(row, 0).text()
-        item_id = self.table.item(row, 1).text()
-        name_zh = self.table.item(row, 2).text()
-        name_en = self.table.item(row, 3).text()
+        file_name, item_id, name_zh, name_en, _ = self.model.rows[self.context_row]
         
-        menu = QMenu()
-        
-        # 定义动作
-        copy_id_action = QAction(f"复制 ID: {item_id}", self)
-        copy_zh_action = QAction(f"复制中文名: {name_zh}", self)
-        copy_en_action = QAction(f"复制英文名: {name_en}", self)
-        view_detail_action = QAction("查看详细信息", self)
-        
-        # 绑定动作
-        copy_id_action.triggered.connect(lambda: self.copy_to_clipboard(item_id, "ID"))
-        copy_zh_action.triggered.connect(lambda: self.copy_to_clipboard(name_zh, "中文名"))
-        copy_en_action.triggered.connect(lambda: self.copy_to_clipboard(name_en, "英文名"))
-        view_detail_action.triggered.connect(lambda: self.show_detail_by_row(row))
+        self.copy_id_action.setText(f"复制 ID: {item_id}")
+        self.copy_zh_action.setText(f"复制中文名: {name_zh}")
+        self.copy_en_action.setText(f"复制英文名: {name_en}")
         
-        menu.addAction(copy_id_action)
-        menu.addAction(copy_zh_action)
-        menu.addAction(copy_en_action)
-        menu.addSeparator()
-        menu.addAction(view_detail_action)
-        
-        menu.exec(self.table.viewport().mapToGlobal(position))
+        self.context_menu.exec(self.table.viewport().mapToGlobal(position))
+
+    def copy_context_id(self):
+        self.copy_to_clipboard(self.model.rows[self.context_row][1], "ID")
+
+    def copy_context_zh(self):
+        self.copy_to_clipboard(self.model.rows[self.context_row][2], "中文名")
+
+    def copy_context_en(self):
+        self.copy_to_clipboard(self.model.rows[self.context_row][3], "英文名")
+
+    def show_context_detail(self):
+        self.show_detail_by_row(self.context_row)
 
     def copy_to_clipboard(self, text, type_name):
         clipboard = QApplication.clipboard()
         clipboard.setText(text)
         self.status_label.setText(f"已复制 {type_name}: {text}")
 
-    def show_detail(self, item):
-        self.show_detail_by_row(item.row())
+    def show_detail(self, index):
+        self.show_detail_by_row(index.row())
 
     def show_detail_by_row(self, row):
-        # 从第一列的 UserRole 获取完整 JSON
-        json_str = self.table.item(row, 0).data(Qt.UserRole)
+        # 搜索结果只带 rowid，打开详情时再从数据库读取完整 JSON
+        file_name, item_id, _, _, rowid = self.model.rows[row]
+        json_str = self.db.get_json(rowid, item_id, file_name)
         
         if json_str:
             detail_win = DetailWindow(json_str)
             detail_win.show()
-            self.detail_windows.append(detail_win) # 保持引用
-            
-            # 清理已关闭的窗口引用
-            self.detail_windows = [w for w in self.detail_windows if w.isVisible()]
+            keep_window(detail_win) # 保持引用，关闭后自动清理
 
     def start_update(self):
         if self.update_worker and self.update_worker.isRunning():